@@ -16,10 +16,23 @@ Part of synth_tools.
 import synthio
 
 from synth_tools.patch import Patch, WaveType
-from synth_tools.waves import Waves, Wavetable, lerp
+from synth_tools.waves import Waves, Wavetable, lerp, open_wave_bank, warm_wave_cache
+from synth_tools.wavecodec import CODEC_PCM16
+from synth_tools.modulation import ModRoute
+from synth_tools.patch_morph import PatchMorph
+from synth_tools.pitch_glider import Glider
 
 lfo_exp_wave = Waves.lfo_exp_wave()
 
+supersaw_steps = 8  # how many supersaw spread settings wave_mix picks from
+
+def supersaw_cycles(step):
+    """Cycles in the supersaw table of a spread step, notes playing it
+    are pitched down by that much"""
+    return Waves.supersaw_cycles(Waves.supersaw_size, step / (supersaw_steps-1))
+
+filt_min_freq, filt_max_freq = 60, 8000
+
 class Instrument():
     """
     Basic instrument that uses synthio
@@ -62,6 +75,135 @@ class Instrument():
 
 
 
+class VoiceLifecycle:
+    """
+    Tracks the voices of an Instrument through their life: `active` voices
+    are held (keyed by midi note), `releasing` voices have been let go but
+    are still sounding their release. `reap()` checks releasing voices with
+    `synth.note_info()` and once their notes are done, removes their blocks
+    from `synth.blocks`. A voice needs `notes` and `blocks` tuples.
+    """
+    def __init__(self, synth):
+        self.synth = synth
+        self.active = {}  # midi_note -> voice
+        self.releasing = []
+
+    @property
+    def num_active(self):
+        """Number of held voices"""
+        return len(self.active)
+
+    @property
+    def num_releasing(self):
+        """Number of voices let go but still sounding"""
+        return len(self.releasing)
+
+    def press(self, midi_note, voice):
+        """Start a voice sounding, adding its blocks to the synth"""
+        self.forget(voice)
+        self.active[midi_note] = voice
+        self.synth.press(voice.notes)
+        for b in voice.blocks:
+            self.synth.blocks.append(b)
+
+    def release(self, midi_note):
+        """Release the voice playing midi_note, returns the voice or None"""
+        voice = self.active.pop(midi_note, None)
+        if voice:
+            self.synth.release(voice.notes)
+            self.releasing.append(voice)
+        return voice
+
+    def forget(self, voice):
+        """Stop tracking a voice and remove its blocks, e.g. when reusing it"""
+        for note, v in self.active.items():
+            if v is voice:
+                self.active.pop(note)
+                break
+        if voice in self.releasing:
+            self.releasing.remove(voice)
+        for b in voice.blocks:
+            if b in self.synth.blocks:
+                self.synth.blocks.remove(b)
+
+    def reap(self):
+        """Reclaim releasing voices whose notes have finished sounding"""
+        i = len(self.releasing)
+        while i:
+            i -= 1
+            voice = self.releasing[i]
+            if self.synth.note_info(voice.notes[0])[0] is None:
+                self.forget(voice)
+
+    def sounding(self):
+        """Iterate over all voices still making sound, held or releasing"""
+        yield from self.active.values()
+        yield from self.releasing
+
+
+class Voice:
+    """
+    One reusable voice of `PolyWaveSynth`: two oscillator Notes sharing a
+    filter, with a filter envelope LFO routed to the filter frequency.
+    Made once in the voice pool and re-set on each note_on,
+    so playing notes does not allocate.
+    A synthio.Biquad's mode cannot be changed, so each voice has one
+    Biquad per filter mode and `set_filter_mode()` picks between them.
+    """
+    def __init__(self):
+        self.filt_env = synthio.LFO(once=True, waveform=lfo_exp_wave)  # 0-1
+        # filter freq = filt_f + filt_env * filt_env_amount
+        self.filt_route = ModRoute(self.filt_env, amount=0, offset=filt_max_freq,
+                                   lo=filt_min_freq, hi=filt_max_freq)
+        self.filters = {mode: synthio.Biquad(mode, frequency=self.filt_route.block, Q=0.7)
+                        for mode in (synthio.FilterMode.LOW_PASS,
+                                     synthio.FilterMode.HIGH_PASS,
+                                     synthio.FilterMode.BAND_PASS)}
+        self.filt = self.filters[synthio.FilterMode.LOW_PASS]  # the one in use
+        self.osc1 = synthio.Note(frequency=440, filter=self.filt)
+        self.osc2 = synthio.Note(frequency=440, filter=self.filt)
+        self.notes = (self.osc1, self.osc2)
+        # not tracked automaticallly by synthio
+        self.blocks = (self.filt_env,) + self.filt_route.blocks
+        self.midi_note = None  # None when not held
+        self.age = 0  # note_on count when this voice was last pressed
+        # own wavetable position, only if PolyWaveSynth wave_pos_tracking is on
+        self.waveform = None  # waveform buffer from the pool
+        self.wave_pos_offset = None  # None when its waveform should not move
+        self.wave_pos_q = None  # wave pos waveform was mixed at, in 1/256 waves
+
+    def set_filter_mode(self, mode):
+        """Filter both oscillators with the Biquad for a synthio.FilterMode,
+        or not at all if mode is None"""
+        if mode is not None:
+            self.filt = self.filters[mode]
+        filt = self.filt if mode is not None else None
+        if self.osc1.filter is not filt:
+            self.osc1.filter = filt
+            self.osc2.filter = filt
+
+
+class StagedPatch:
+    """
+    Everything `PolyWaveSynth.stage_patch()` builds for a patch ahead of
+    time, for `PolyWaveSynth.swap_patch()` to switch to in one go.
+    """
+    def __init__(self, patch):
+        self.patch = patch
+        self.blocks = []  # global blocks: wave lfo & wave_pos route
+        self.wave_lfo = None
+        self.wave_pos_route = None
+        self.wavetable = None
+        self.waveformA = None
+        self.waveformB = None
+        self.waveform = None
+        self.wave_mix = None  # wave_mix the waveform was mixed at
+        self.ssaw_step = None
+        self.ssaw_tables = None  # supersaw of each spread step, all made up front
+        self.wave_cycles = 1  # cycles per waveform, notes are pitched down by it
+        self.mix_idx = None  # which mix buffer waveform is, if it is one
+
+
 class PolyWaveSynth(Instrument):
     """
     This implementation of Instrument is a two-oscillator per voice
@@ -74,155 +216,663 @@ class PolyWaveSynth(Instrument):
     of +/-16383 instead of +/-32767 to provide from summing headroom
     when doing multiple voices (synthio tries to do this, but I still
     experience clipping)
+
+    If `morph_steps` is non-zero, wavetable patches precompute that many
+    mixes per wave over the wave LFO's range when loaded, so update() only
+    copies a ready-made waveform instead of mixing every tick.
+
+    For WaveType.SSAW patches, each oscillator plays a precomputed
+    supersaw (seven detuned saws in one multi-cycle waveform, played
+    pitched down by its number of cycles), picked by wave_mix from
+    `supersaw_steps` spread settings, with osc2 detuned as usual.
+    So a supersaw costs two Notes per key instead of seven for unison saws.
+    The tables of all spread settings are made when the patch is staged,
+    so turning the spread in update() only points the notes at another
+    table and never allocates.
+
+    Voices come from a fixed pool of `num_voices` `Voice`s. When all are
+    held, a new note steals the oldest one, or the quietest one if
+    `steal_quietest` is set. Released voices keep their filter running
+    until their release is done, tracked by `lifecycle`.
+
+    Patches can be loaded in pieces with `stage_patch()` and switched to
+    with `swap_patch()`. Mixed waveforms are double-buffered, so the
+    next patch is mixed into the buffer notes are not playing.
+
+    By default all voices of a wavetable patch play the same waveform.
+    If `wave_pos_tracking` is `WAVE_POS_VELOCITY` or `WAVE_POS_KEY`, each
+    voice gets its own waveform buffer, made once per voice at startup,
+    and plays at its own wave position: the patch's wave position plus
+    `wave_pos_track_amount` waves times velocity (0-1) or times octaves
+    from middle C. Each update() remixes at most `wave_pos_budget` voices
+    whose wave position moved, taking turns.
+
+    morph_to() and set_morph() crossfade the loaded patch's settings
+    towards another patch, see `PatchMorph`. The morph is an overlay:
+    voices play `played`, which is the loaded `patch` or, while morphing,
+    a morphed copy of it, so the loaded patch itself is never changed by
+    morphing, and knob edits to it carry over into the morph.
     """
 
-    def __init__(self, synth, patch):
+    WAVE_POS_SHARED = 0
+    WAVE_POS_VELOCITY = 1
+    WAVE_POS_KEY = 2
+
+    def __init__(self, synth, patch, morph_steps=0, morph_max_bytes=16*1024,
+                 num_voices=8, steal_quietest=False, wave_pos_tracking=WAVE_POS_SHARED,
+                 wave_pos_track_amount=4, wave_pos_budget=2, wave_size=256):
         super().__init__(synth)
+        self.voice_pool = [Voice() for _ in range(num_voices)]
+        self.wave_pos_tracking = wave_pos_tracking
+        self.wave_pos_track_amount = wave_pos_track_amount
+        self.wave_pos_budget = wave_pos_budget
+        self._wave_pos_next = 0  # voice pool index to start remixing at
+        if wave_pos_tracking != self.WAVE_POS_SHARED:
+            for voice in self.voice_pool:
+                voice.waveform = Waves.silence(wave_size)
+        self.lifecycle = VoiceLifecycle(synth)
+        self.voices = self.lifecycle.active
+        self.steal_quietest = steal_quietest
+        self.note_count = 0
+        self.amp_envs = {}  # amp_env times -> Envelope
+        self.wavetable = None
+        self.patch_blocks = []  # global blocks of the loaded patch
+        self._mix_buffers = [None, None]  # working buffers for wave mixing, reused
+        self._mix_idx = 0  # which one the loaded patch plays
+        self.morph_steps = morph_steps
+        self.morph_max_bytes = morph_max_bytes
+        self.morph = None  # PatchMorph towards another patch, if morphing
+        self.morph_amount = 0  # set_morph() amount, kept for the next morph_to()
+        self.played = patch  # patch settings voices play, see morph_to()
         self.load_patch(patch)
 
     def update_filter_mode(self):
-        if self.patch.filt_type == "LP":
+        if self.played.filt_type == "LP":
             self.filter_mode = synthio.FilterMode.LOW_PASS
-        elif self.patch.filt_type == "HP":
+        elif self.played.filt_type == "HP":
             self.filter_mode = synthio.FilterMode.HIGH_PASS
-        elif self.patch.filt_type == "BP":
+        elif self.played.filt_type == "BP":
             self.filter_mode = synthio.FilterMode.BAND_PASS
         else: 
             self.filter_mode = None
 
     def load_patch(self, patch):
-        """Loads patch specifics from passed-in Patch object.
-           ##### FIXME: no it doesnt: Will reload patch if patch is not specified. """
-        self.patch = patch #  self.patch or patch
-        print("PolyWaveSynth.load_patch:", patch, patch.wave_dir)
-
-        self.synth.blocks.clear()   # remove any global LFOs
+        """
+        Loads patch specifics from passed-in Patch object, all at once.
+        Held notes are released into their release, see `swap_patch()`.
+        To load without stalling the caller, use `stage_patch()` instead.
+        """
+        for staged in self.stage_patch(patch):
+            pass
+        self.swap_patch(staged)
 
-        raw_lfo1 = synthio.LFO(rate = self.patch.wave_mix_lfo_rate)
+    def stage_patch(self, patch):
+        """
+        Generator that builds the waveforms, wavetable and LFOs `patch`
+        needs a piece at a time, without touching what is playing now.
+        It yields None between pieces, so an async caller can
+        `await asyncio.sleep(0)` each time, and a `StagedPatch` last,
+        to hand to `swap_patch()`.
+        """
+        print("PolyWaveSynth.stage_patch:", patch, patch.wave_dir)
+        staged = StagedPatch(patch)
+        raw_lfo1 = synthio.LFO(rate = patch.wave_mix_lfo_rate)
         lfo1 = synthio.Math( synthio.MathOperation.SCALE_OFFSET, raw_lfo1, 0.5, 0.5) # unipolar
-        self.wave_lfo = lfo1
-        self.synth.blocks.append(lfo1)  # global lfo for wave_lfo
-        
+        staged.wave_lfo = lfo1
+        staged.blocks.append(lfo1)  # global lfo for wave_lfo
+        # the mix buffer live notes are not playing, so filling it is silent
+        mix_idx = 1 - self._mix_idx
+        yield None
+
         # standard two-osc oscillator patch
         if patch.wave_type == WaveType.OSC:
-            # self.waveform is our working buffer, overwritten w/ wavemix
-            self.waveform = Waves.make_waveform('silence')
-            self.waveformA = Waves.make_waveform(patch.wave)
-            self.waveformB = None
+            # waveformA & B are shared read-only waveforms, so if mixing,
+            # waveform is our working buffer, overwritten w/ wavemix
+            staged.waveformA = Waves.shared_waveform(patch.wave)
+            staged.waveform = staged.waveformA
             if patch.waveB:
-                self.waveformB = Waves.make_waveform(patch.waveB)
-            else:
-                self.waveform = self.waveformA
+                yield None
+                staged.waveformB = Waves.shared_waveform(patch.waveB)
+                staged.waveform = self._mix_buffer(mix_idx, staged.waveformA)
+                staged.wave_mix = patch.wave_mix
+                staged.waveform[:] = lerp(staged.waveformA, staged.waveformB, patch.wave_mix)
+                staged.mix_idx = mix_idx
+
+        # supersaw patch, notes play the shared table of the spread step
+        elif patch.wave_type == WaveType.SSAW:
+            staged.ssaw_tables = []
+            for step in range(supersaw_steps):  # wave_mix can pick any of them
+                staged.ssaw_tables.append(Waves.shared_supersaw(step, supersaw_steps))
+                yield None
+            staged.ssaw_step = int(patch.wave_mix * (supersaw_steps-1) + 0.5)
+            staged.waveform = staged.ssaw_tables[staged.ssaw_step]
+            staged.wave_cycles = supersaw_cycles(staged.ssaw_step)
 
         # wavetable patch
         elif patch.wave_type == WaveType.WTB:
-            self.wavetable = Wavetable(patch.wave_dir+"/"+patch.wave+".WAV")
-            self.waveform = self.wavetable.waveform
+            bank = open_wave_bank(patch.wave_dir)
+            if bank and patch.wave in bank:
+                # compressed banks are small enough to keep the table in RAM
+                in_memory = bank.table_codec(patch.wave) != CODEC_PCM16
+                wavetable = Wavetable(patch.wave, bank=bank, in_memory=in_memory)
+            else:
+                wavetable = Wavetable(patch.wave_dir+"/"+patch.wave+".WAV")
+            staged.wavetable = wavetable
+            staged.waveform = wavetable.waveform
+            # wave_pos = wave_mix position in table + wave lfo * lfo amount
+            staged.wave_pos_route = ModRoute(lfo1, lo=0, hi=wavetable.num_waves-1)
+            staged.blocks.extend(staged.wave_pos_route.blocks)
+            if self.morph_steps:
+                yield None
+                # same wave_pos range as update() can reach with the wave lfo
+                pos_min = patch.wave_mix * wavetable.num_waves
+                pos_max = pos_min + patch.wave_mix_lfo_amount * 10
+                wavetable.precompute_morph(pos_min, pos_max, self.morph_steps,
+                                           self.morph_max_bytes)
+        yield staged
+
+    def warm_patch(self, patch):
+        """
+        Get ready what loading patch will need, so a later load is quicker:
+        its shared waveforms, and the first wavetable waves it reads into
+        `wave_cache`. Returns the number of bytes of waves read.
+        """
+        if patch.wave_type == WaveType.OSC:
+            Waves.shared_waveform(patch.wave)
+            if patch.waveB:
+                Waves.shared_waveform(patch.waveB)
+        elif patch.wave_type == WaveType.SSAW:
+            for step in range(supersaw_steps):
+                Waves.shared_supersaw(step, supersaw_steps)
+        elif patch.wave_type == WaveType.WTB:
+            bank = open_wave_bank(patch.wave_dir)
+            if bank and patch.wave in bank:
+                if bank.table_codec(patch.wave) != CODEC_PCM16:  # read whole into RAM on load
+                    return 0
+                return warm_wave_cache(patch.wave, patch.wave_mix, bank=bank)
+            try:
+                return warm_wave_cache(patch.wave_dir+"/"+patch.wave+".WAV", patch.wave_mix)
+            except OSError:  # loading it will say so
+                pass
+        return 0
+
+    def warm_patches(self, patches, max_bytes=8*1024):
+        """
+        Generator that warms each of patches in turn with warm_patch(),
+        yielding the bytes read so far after each, and stopping once
+        max_bytes have been read, so warming does not push the playing
+        patch's waves out of `wave_cache`.
+        """
+        num_bytes = 0
+        for patch in patches:
+            num_bytes += self.warm_patch(patch)
+            yield num_bytes
+            if num_bytes >= max_bytes:
+                return
+
+    def _mix_buffer(self, idx, src):
+        """Copy src into working mix buffer `idx`, made on first use"""
+        buf = Waves.copy_waveform(src, self._mix_buffers[idx])
+        self._mix_buffers[idx] = buf
+        return buf
+
+    def swap_patch(self, staged):
+        """
+        Switch to a patch built by `stage_patch()`. Held notes are
+        released, so they fade out with the old patch's waveform and
+        filter, and the old patch's global LFOs are swapped for the
+        new ones without clearing `synth.blocks` out from under them.
+        """
+        self.note_off_all()
+        self.morph_to(None)  # leave the old patch as it was
+        for voice in self.voice_pool:  # released voices keep their last wave
+            voice.wave_pos_offset = None
+        blocks = self.synth.blocks
+        for block in self.patch_blocks:
+            if block in blocks:
+                blocks.remove(block)
+        blocks.extend(staged.blocks)
+        self.patch_blocks = staged.blocks
+        if self.wavetable:  # its waves stay in wave_cache for next time
+            self.wavetable.deinit()
+
+        self.patch = self.played = staged.patch
+        self.amp_envs.clear()
+        self.wave_lfo = staged.wave_lfo
+        self.wave_pos_route = staged.wave_pos_route
+        self.wavetable = staged.wavetable
+        self.waveformA = staged.waveformA
+        self.waveformB = staged.waveformB
+        self.waveform = staged.waveform
+        self._wave_mix = staged.wave_mix
+        self._ssaw_step = staged.ssaw_step
+        self._ssaw_tables = staged.ssaw_tables
+        self._wave_cycles = staged.wave_cycles
+        if staged.mix_idx is not None:
+            self._mix_idx = staged.mix_idx
+        if self.wave_pos_route:
+            self._set_wave_pos_route()
+
+    def morph_to(self, patch):
+        """Start morphing the loaded patch towards patch, or stop morphing
+        if patch is None. Stopping plays the loaded patch as it is again.
+        A new morph starts at the amount last given to set_morph()."""
+        if self.morph:
+            changes = set(self.morph.fields)
+            changes.update(self.played.pop_changes() or ())
+            self.morph = None
+            self.played = self.patch
+            self._apply_changes(changes)
+        if patch:
+            self.morph = PatchMorph(self.patch, patch, self._morph_targets)
+            self.played = self.morph.played
+            self.set_morph(self.morph_amount)
+
+    def set_morph(self, amount):
+        """Set how far (0-1) the loaded patch is morphed, see morph_to()"""
+        self.morph_amount = amount
+        if self.morph and amount != self.morph.amount:
+            self.morph.set_amount(amount)
+            if 'detune' in self.morph.fields:
+                self.redetune()
+
+    def _morph_targets(self, name):
+        """
+        The synthio objects the morph writes a setting straight into,
+        as (object, attribute, scale), the same as _apply_changes() sets.
+        Every pooled voice gets its values, so a note started while
+        morphing is already set. Settings read only at note_on have none.
+        """
+        # a ModRoute's offset and amount are its Math block's c and b
+        if name == 'filt_f':
+            return [(v.filt_route.math, 'c', 1) for v in self.voice_pool]
+        if name == 'filt_env_amount':
+            return [(v.filt_route.math, 'b', filt_max_freq / 2) for v in self.voice_pool]
+        if name == 'filt_q':
+            return [(f, 'Q', 1) for v in self.voice_pool for f in v.filters.values()]
+        if name == 'wave_mix_lfo_rate':
+            return [(self.wave_lfo.a, 'rate', 1)]
+        if self.wave_pos_route and name == 'wave_mix':
+            return [(self.wave_pos_route.math, 'c', self.wavetable.num_waves)]
+        if self.wave_pos_route and name == 'wave_mix_lfo_amount':
+            return [(self.wave_pos_route.math, 'b', 10)]
+        return []
 
     def reload_patch(self):
-        """Reload the set patch, turns off all notes"""
-        self.note_off_all()
-        self.synth.blocks.clear()  # clear out global wavetable LFOs (if any)
+        """Reload the set patch, releases all notes"""
         self.load_patch(self.patch)
 
-    def _update_filter(self, osc1, osc2, filt_env):
-        # FIXME: rethink this
-        #filt_amount = self.patch.filt_env_amount
-        #filt_fmax = 8000   # TODFIXME: put this & filt_fmin somewhere (instrument?)
-        #filt_mod = filt_amount * filt_fmax * (filt_env.value/2)  # 8k/2 = max freq
-        #filt_f = min(max(self.patch.filt_f + filt_mod, 60), 8000)
-        filt_f = self.patch.filt_f
-        osc1.filter.frequency.scale = filt_f
-        if osc2:
-            osc2.filter.frequency.scale = filt_f
+    def _set_wave_pos_route(self):
+        """Set the wave position route from the patch"""
+        # TODFIXME what is wave_mix_lfo_amount range
+        self.wave_pos_route.amount = self.played.wave_mix_lfo_amount * 10
+        self.wave_pos_route.offset = self.played.wave_mix * self.wavetable.num_waves
+
+    def _set_filt_route(self, voice):
+        """Set a voice's filter envelope route from the patch"""
+        voice.filt_route.offset = self.played.filt_f
+        voice.filt_route.amount = self.played.filt_env_amount * filt_max_freq / 2
+
+    def _apply_changes(self, changes):
+        """Push patch settings changed with Patch.set() to synthio objects"""
+        p = self.played
+        if 'filt_type' in changes:
+            self.update_filter_mode()
+        if 'wave_mix_lfo_rate' in changes:
+            self.wave_lfo.a.rate = p.wave_mix_lfo_rate
+        if self.wave_pos_route and ('wave_mix' in changes or
+                                    'wave_mix_lfo_amount' in changes):
+            self._set_wave_pos_route()
+        for voice in self.lifecycle.sounding():
+            if 'filt_f' in changes or 'filt_env_amount' in changes:
+                self._set_filt_route(voice)
+            if 'filt_type' in changes:
+                voice.set_filter_mode(self.filter_mode)
+            if 'filt_q' in changes or 'filt_type' in changes:
+                voice.filt.Q = p.filt_q
+        if 'detune' in changes:
+            self.redetune()
 
     def update(self):
-        """Update filter envelope and wave-mixing, should be called frequently"""
-        p = self.patch
-        for (osc1,osc2,filt_env) in self.voices.values():
-
-            # for each voice, update filter
-            self._update_filter(osc1,osc2,filt_env)
-
-            # if wavetable, wave_mix is normalized wave pos in wavetable
-            if p.wave_type == WaveType.WTB:
-                self.wave_lfo.a.rate = p.wave_mix_lfo_rate  # TODFIXME: danger
-                # TODFIXME what is wave_mix_lfo_amount range
-                wave_pos = self.wave_lfo.value * p.wave_mix_lfo_amount * 10
-                wave_pos += p.wave_mix * self.wavetable.num_waves
-                self.wavetable.set_wave_pos(wave_pos)
-
-            # else simple osc wave mixing between two waveforms
-            else:
-                if self.waveformB:
-                    # TODFIXME: does not work yet
-                    #wave_mix = self.patch.wave_mix + self.wave_lfo.a.rate
-                    #  * self.patch.wave_mix_lfo_amount * 2
-                    wave_mix = self.patch.wave_mix  # but at least this works
-                    osc1.waveform[:] = lerp(self.waveformA, self.waveformB, wave_mix)
-                    if osc2:
-                        osc2.waveform[:] = lerp(self.waveformA, self.waveformB, wave_mix)
+        """
+        Update filter envelope and wave-mixing, should be called frequently.
+        Patch changes made with Patch.set() are pushed to sounding voices,
+        and work shared by all voices (wave mixing, wave lfo, wavetable)
+        is done once per call. With no knob moving, this does very little.
+        """
+        self.lifecycle.reap()  # reclaim voices that finished their release
+        if self.patch.wave_type == WaveType.WTB:
+            self.wavetable.prefetch()  # read ahead of where the wave lfo goes
+        changes = self.patch.pop_changes()
+        if self.morph:  # knob edits go into the morph, which plays them
+            if changes:
+                self.morph.update(changes)
+            changes = self.played.pop_changes()
+        if changes:
+            self._apply_changes(changes)
+        if not (self.lifecycle.num_active or self.lifecycle.num_releasing):
+            return
+        if self._voice_wave_pos():
+            self._update_voice_waves()
+        else:
+            self._update_shared()
+
+    def _voice_wave_pos(self):
+        """True if voices each play their own wave position"""
+        return (self.wave_pos_tracking != self.WAVE_POS_SHARED and
+                self.patch.wave_type == WaveType.WTB)
+
+    def _update_voice_waves(self):
+        """
+        Remix the waveform of voices whose wave position moved,
+        at most wave_pos_budget of them, picking up where the last call left off.
+        """
+        base = self.wave_pos_route.value
+        top = self.wavetable.num_waves - 1
+        pool = self.voice_pool
+        num_voices = len(pool)
+        budget = self.wave_pos_budget
+        for i in range(num_voices):
+            voice = pool[(self._wave_pos_next + i) % num_voices]
+            if voice.wave_pos_offset is None:
+                continue
+            if voice.midi_note is None and voice not in self.lifecycle.releasing:
+                voice.wave_pos_offset = None  # its release is done
+                continue
+            wave_pos = min(max(base + voice.wave_pos_offset, 0), top)
+            wave_pos_q = int(wave_pos * 256)
+            if wave_pos_q == voice.wave_pos_q:
+                continue
+            voice.wave_pos_q = wave_pos_q
+            self.wavetable.mix_into(voice.waveform, wave_pos)
+            budget -= 1
+            if not budget:
+                self._wave_pos_next = (self._wave_pos_next + i + 1) % num_voices
+                return
+
+    def _update_shared(self):
+        """Update the waveform all voices share, skipping it if nothing changed"""
+        p = self.played
+        # if wavetable, wave_mix is normalized wave pos in wavetable
+        if p.wave_type == WaveType.WTB:
+            # wave_pos is computed by synthio, see _set_wave_pos_route()
+            self.wavetable.set_wave_pos(self.wave_pos_route.value)  # skips if unchanged
+
+        # supersaw, wave_mix picks spread
+        elif p.wave_type == WaveType.SSAW:
+            step = int(p.wave_mix * (supersaw_steps-1) + 0.5)
+            if step != self._ssaw_step:
+                self._ssaw_step = step
+                self.waveform = self._ssaw_tables[step]  # made by stage_patch()
+                cycles = supersaw_cycles(step)
+                ratio = self._wave_cycles / cycles  # keep sounding notes in tune
+                self._wave_cycles = cycles
+                for voice in self.lifecycle.sounding():
+                    voice.osc1.waveform = voice.osc2.waveform = self.waveform
+                    voice.osc1.frequency *= ratio
+                    voice.osc2.frequency *= ratio
+
+        # else simple osc wave mixing between two waveforms
+        elif self.waveformB:
+            # TODFIXME: does not work yet
+            #wave_mix = self.patch.wave_mix + self.wave_lfo.a.rate
+            #  * self.patch.wave_mix_lfo_amount * 2
+            wave_mix = p.wave_mix  # but at least this works
+            if wave_mix != self._wave_mix:
+                self._wave_mix = wave_mix
+                self.waveform[:] = lerp(self.waveformA, self.waveformB, wave_mix)
+
+    def _amp_env(self):
+        """Get the amp Envelope, only made when its settings change"""
+        env = self.played.amp_env
+        key = (env.attack_time, env.decay_time, env.release_time)
+        amp_env = self.amp_envs.get(key)
+        if amp_env is None:
+            if len(self.amp_envs) > 32:  # knob was moved a lot, start over
+                self.amp_envs.clear()
+            amp_env = synthio.Envelope(attack_time = env.attack_time,
+                                       decay_time = env.decay_time,
+                                       release_time = env.release_time,
+                                       attack_level = 1.0,
+                                       sustain_level = 1.0)
+            self.amp_envs[key] = amp_env
+        return amp_env
+
+    def _alloc_voice(self):
+        """
+        Get a voice from the pool: an unused voice if there is one,
+        else the quietest releasing voice, else steal a held voice.
+        """
+        synth = self.synth
+        lifecycle = self.lifecycle
+        if lifecycle.num_active + lifecycle.num_releasing < len(self.voice_pool):
+            for voice in self.voice_pool:
+                if voice.midi_note is None and voice not in lifecycle.releasing:
+                    return voice
+        if lifecycle.releasing:
+            victim = min(lifecycle.releasing, key=lambda v: synth.note_info(v.osc1)[1])
+        elif self.steal_quietest:
+            victim = min(self.voice_pool, key=lambda v: synth.note_info(v.osc1)[1])
+        else:
+            victim = min(self.voice_pool, key=lambda v: v.age)
+        synth.release(victim.notes)
+        lifecycle.forget(victim)
+        victim.midi_note = None
+        return victim
 
     def note_on(self, midi_note, midi_vel=127):
-        # amp_env = self.patch.amp_env.make_env()
+        self.note_off(midi_note)  # a re-pressed note gets a fresh voice
         self.update_filter_mode()  # sigh
         #print("filt_type:", self.filter_mode, self.patch.filt_type)
-        lvl = 0.25 + (midi_vel/127/2)
-        amp_env = synthio.Envelope(attack_time = self.patch.amp_env.attack_time,
-                                   decay_time = self.patch.amp_env.decay_time,
-                                   release_time = self.patch.amp_env.release_time,
-                                   attack_level = lvl,
-                                   sustain_level = lvl)
-
-        filt_min_freq = 100  # fixme
-        filt_env_rate = 1 / (self.patch.filt_env.attack_time + 0.001)
-        filt_env = synthio.LFO(once=True, rate=filt_env_rate,
-                               offset=filt_min_freq, scale=self.patch.filt_f,
-                               waveform=lfo_exp_wave)
-
-        filt = synthio.Biquad(self.filter_mode, frequency=filt_env, Q=self.patch.filt_q)
-                              
-        f = synthio.midi_to_hz(midi_note)
-        osc1 = synthio.Note( frequency=f, waveform=self.waveform, envelope=amp_env, filter=filt)
-        ## osc2 = None
-        ## if self.patch.detune:
-        osc2 = synthio.Note(frequency=f * self.patch.detune,
-                            waveform=self.waveform,
-                            envelope=amp_env, filter=filt)
+        lvl = 0.25 + (midi_vel/127/2)  # velocity to level
+        amp_env = self._amp_env()
 
-        self.voices[midi_note] = (osc1, osc2, filt_env)
-        self.update()  # update filter and wave before note press
-        self.synth.press( (osc1,osc2) )
-        self.synth.blocks.append(filt_env) # not tracked automaticallly by synthio
+        voice = self._alloc_voice()
+        osc1, osc2, filt_env = voice.osc1, voice.osc2, voice.filt_env
+
+        filt_env.rate = 1 / (self.played.filt_env.attack_time + 0.001)
+        filt_env.retrigger()
+        self._set_filt_route(voice)
+
+        voice.set_filter_mode(self.filter_mode)
+        voice.filt.Q = self.played.filt_q
+
+        f = synthio.midi_to_hz(midi_note) / self._wave_cycles
+        osc1.frequency = f
+        osc2.frequency = f * self.played.detune
+        if self._voice_wave_pos():
+            if self.wave_pos_tracking == self.WAVE_POS_VELOCITY:
+                track = midi_vel / 127
+            else:
+                track = (midi_note - 60) / 12
+            voice.wave_pos_offset = track * self.wave_pos_track_amount
+            wave_pos = self.wave_pos_route.value + voice.wave_pos_offset
+            wave_pos = min(max(wave_pos, 0), self.wavetable.num_waves-1)
+            voice.wave_pos_q = int(wave_pos * 256)
+            self.wavetable.mix_into(voice.waveform, wave_pos)  # not in budget, it starts now
+            osc1.waveform = osc2.waveform = voice.waveform
+        else:
+            voice.wave_pos_offset = None
+            osc1.waveform = osc2.waveform = self.waveform
+        osc1.envelope = osc2.envelope = amp_env
+        osc1.amplitude = osc2.amplitude = lvl
+
+        self.note_count += 1
+        voice.age = self.note_count
+        voice.midi_note = midi_note
+        self.lifecycle.press(midi_note, voice)
+        if not self._voice_wave_pos():
+            self._update_shared()  # update wave
 
 
     def note_off(self, midi_note, midi_vel=0):
-        (osc1,osc2,filt_env) = self.voices.get(midi_note, (None,None,None))
-        #print("note_off:",osc1)
+        # voice keeps its filter running until its release is done
+        voice = self.lifecycle.release(midi_note)
+        #print("note_off:",voice)
 
         # FIXME: add release envelope to filter
-        
-        if osc1:  # why this check: in case user tries to note_off a non-existant note
-            self.synth.release((osc1,osc2))
-            # TODFIXME: let filter run on release, check amp_env?
-            self.voices.pop(midi_note)
-            # TODFIXME: figure out how to release after note is done
-            self.synth.blocks.remove(filt_env)
-        #print("note_off: blocks:", self.synth.blocks)
+
+        if voice:  # why this check: in case user tries to note_off a non-existant note
+            voice.midi_note = None
 
     def note_off_all(self):
         """Turn off all currently playing notes"""
-        for n in self.voices:
+        for n in list(self.voices):
             print("note_off_all:",n)
             self.note_off(n)
 
     def redetune(self):
         """Update detune settings in realtime"""
-        for (osc1,osc2,*_) in self.voices.values():
-            osc2.frequency = osc1.frequency * self.patch.detune
-
-#
-# class MonoOsc(Instrument):
-#     def __init__(self, synth, patch):
-#         super().__init__(synth)
-#         self.load_patch(patch)
+        for voice in self.voices.values():
+            voice.osc2.frequency = voice.osc1.frequency * self.played.detune
+
+
+class MonoSynth(Instrument):
+    """
+    A monophonic, single-oscillator Instrument with note priority,
+    legato and portamento. It uses one `synthio.Note` for its whole life:
+    changing notes only sets the note's frequency and retargets the
+    `Glider` driving its bend, so playing notes does not allocate.
+
+    `priority` picks which held note sounds: `PRIORITY_LAST` (most
+    recently pressed), `PRIORITY_LOW` or `PRIORITY_HIGH`.
+    If `legato` is set, a note change while a note is held does not
+    retrigger the envelope, and glides over `glide_time` seconds.
+    Otherwise every note_on retriggers and no glide happens.
+    """
+
+    PRIORITY_LAST = 0
+    PRIORITY_LOW = 1
+    PRIORITY_HIGH = 2
+
+    def __init__(self, synth, patch=None, priority=PRIORITY_LAST, legato=True,
+                 glide_time=0.1, max_held=10):
+        super().__init__(synth, patch)
+        self.priority = priority
+        self.legato = legato
+        self.held = [0] * max_held  # stack of held notes, oldest first
+        self.num_held = 0
+        self.midi_note = None  # note currently sounding
+        self.glider = Glider(glide_time, 0)
+        self.wave_cycles = 1  # cycles per waveform, the note is pitched down by it
+        # a Biquad's mode is fixed, so keep one per filter type
+        self.filters = {filt_type: synthio.Biquad(mode, frequency=self.patch.filt_f,
+                                                  Q=self.patch.filt_q)
+                        for filt_type, mode in (("LP", synthio.FilterMode.LOW_PASS),
+                                                ("HP", synthio.FilterMode.HIGH_PASS),
+                                                ("BP", synthio.FilterMode.BAND_PASS))}
+        self.filt = self.filters["LP"]  # the one in use
+        self.note = synthio.Note(frequency=440, bend=self.glider.lerp, filter=self.filt)
+        self.load_patch(self.patch)
+
+    @property
+    def glide_time(self):
+        """Time in seconds to glide between legato notes"""
+        return self.glider.glide_time
+
+    @glide_time.setter
+    def glide_time(self, glide_time):
+        self.glider.glide_time = glide_time
+
+    def load_patch(self, patch):
+        """Set up the note from a Patch, uses only its first wave"""
+        self.patch = patch
+        if patch.wave_type == WaveType.SSAW:
+            step = int(patch.wave_mix * (supersaw_steps-1) + 0.5)
+            self.note.waveform = Waves.shared_supersaw(step, supersaw_steps)
+            self.wave_cycles = supersaw_cycles(step)
+        else:
+            self.note.waveform = Waves.shared_waveform(patch.wave)
+            self.wave_cycles = 1
+        self.note.envelope = patch.amp_env.make_env()
+        self._update_filter()
+
+    def _update_filter(self):
+        p = self.patch
+        self.filt = self.filters.get(p.filt_type, self.filt)
+        filt = self.filt if p.filt_type in self.filters else None
+        if self.note.filter is not filt:
+            self.note.filter = filt
+        self.filt.frequency = p.filt_f
+        self.filt.Q = p.filt_q
+
+    def update(self):
+        """Apply patch changes made with Patch.set()"""
+        changes = self.patch.pop_changes()
+        if not changes:
+            return
+        if 'filt_f' in changes or 'filt_q' in changes or 'filt_type' in changes:
+            self._update_filter()
+        for name in changes:
+            if name.startswith('amp_env'):
+                self.note.envelope = self.patch.amp_env.make_env()
+                break
+
+    def _held_index(self, midi_note):
+        for i in range(self.num_held):
+            if self.held[i] == midi_note:
+                return i
+        return -1
+
+    def _remove_held(self, i):
+        for j in range(i, self.num_held - 1):
+            self.held[j] = self.held[j+1]
+        self.num_held -= 1
+
+    def _priority_note(self):
+        """Which held note should sound, by note priority"""
+        held = self.held
+        note = held[self.num_held - 1]
+        if self.priority == MonoSynth.PRIORITY_LOW:
+            for i in range(self.num_held):
+                note = min(note, held[i])
+        elif self.priority == MonoSynth.PRIORITY_HIGH:
+            for i in range(self.num_held):
+                note = max(note, held[i])
+        return note
+
+    def _play(self, midi_note, retrigger):
+        """Move the note to a new pitch, gliding if legato"""
+        if retrigger:
+            self.glider.jump(midi_note)
+        else:
+            self.glider.update(midi_note)
+        self.note.frequency = synthio.midi_to_hz(midi_note) / self.wave_cycles
+        if retrigger:
+            self.synth.release(self.note)
+            self.synth.press(self.note)
+        self.midi_note = midi_note
+
+    def note_on(self, midi_note, midi_vel=127):
+        was_held = self.num_held > 0
+        i = self._held_index(midi_note)
+        if i >= 0:
+            self._remove_held(i)
+        if self.num_held == len(self.held):  # full, forget the oldest
+            self._remove_held(0)
+        self.held[self.num_held] = midi_note
+        self.num_held += 1
+        self.note.amplitude = 0.25 + (midi_vel/127/2)
+        new_note = self._priority_note()
+        retrigger = not (was_held and self.legato)
+        if retrigger or new_note != self.midi_note:
+            self._play(new_note, retrigger)
+
+    def note_off(self, midi_note, midi_vel=0):
+        i = self._held_index(midi_note)
+        if i < 0:
+            return
+        self._remove_held(i)
+        if self.num_held == 0:
+            self.synth.release(self.note)
+            self.midi_note = None
+            return
+        new_note = self._priority_note()
+        if new_note != self.midi_note:  # fall back to a still-held note
+            self._play(new_note, not self.legato)
+
+    def note_off_all(self):
+        """Turn off all notes"""
+        self.num_held = 0
+        self.synth.release(self.note)
+        self.midi_note = None
@@ -0,0 +1,65 @@
+# SPDX-FileCopyrightText: Copyright (c) 2024 Tod Kurt
+# SPDX-License-Identifier: MIT
+"""
+`modulation`
+================================================================================
+
+`ModRoute` routes a modulation source (an LFO, envelope, or any synthio
+block) to a destination using `synthio.Math` blocks, so the modulation
+is computed by synthio itself instead of in Python every update.
+
+Part of synth_tools.
+
+"""
+
+import synthio
+
+class ModRoute:
+    """
+    Route a modulation `source` to a destination as `offset + source * amount`,
+    optionally constrained to between `lo` and `hi`.
+    Make a route once (e.g. per voice), connect `route.block` to the
+    destination (e.g. a Biquad frequency), and add `route.blocks` to
+    `synth.blocks`. After that, changing `amount` or `offset` is a
+    cheap attribute set, and there is no per-update Python work.
+    """
+    def __init__(self, source, amount=1.0, offset=0.0, lo=None, hi=None):
+        self.math = synthio.Math(synthio.MathOperation.SCALE_OFFSET, source, amount, offset)
+        self.block = self.math
+        if lo is not None and hi is not None:  # MID of 3 values is a clamp
+            self.block = synthio.Math(synthio.MathOperation.MID, self.math, lo, hi)
+            self.blocks = (self.math, self.block)
+        else:
+            self.blocks = (self.math,)
+
+    @property
+    def source(self):
+        """The modulation source"""
+        return self.math.a
+
+    @source.setter
+    def source(self, source):
+        self.math.a = source
+
+    @property
+    def amount(self):
+        """How much of the source is applied to the destination"""
+        return self.math.b
+
+    @amount.setter
+    def amount(self, amount):
+        self.math.b = amount
+
+    @property
+    def offset(self):
+        """The destination value when the source is zero"""
+        return self.math.c
+
+    @offset.setter
+    def offset(self, offset):
+        self.math.c = offset
+
+    @property
+    def value(self):
+        """Current value of the route, as last computed by synthio"""
+        return self.block.value
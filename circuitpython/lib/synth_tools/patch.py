@@ -14,6 +14,7 @@ Part of synth_tools.
 import os
 import synthio
 from micropython import const
+from synth_tools.waves import open_wave_bank
 
 class LFOParams:
     """
@@ -66,7 +67,13 @@ def generate_wave_selects(wave_dir):
         "osc:SAW/SIN",
         "osc:SQU/SIN",
         "osc:SIN/NZE",
+        "ssw:SSAW",
     ]
+    bank = open_wave_bank(wave_dir)
+    if bank:  # a wave bank has an index, no need to scan the directory
+        for name in bank.names:
+            wave_selects.append("wtb:"+name)
+        return wave_selects
     # todfixme: check for bad/none dir_path
     for path in os.listdir(wave_dir):
         path = path.upper()
@@ -78,15 +85,18 @@ class WaveType:
     """ Represent which type of waveform the patch's oscillators are"""
     OSC = const(0)  # standard oscillator
     WTB = const(1)  # wavetable oscillator
+    SSAW = const(2)  # supersaw oscillator, wave_mix sets spread
     @staticmethod
     def to_str(t):
         """Create string repr of a WaveType"""
         if t==WaveType.WTB:  return 'wtb'
+        if t==WaveType.SSAW:  return 'ssw'
         return 'osc'
     @staticmethod
     def from_str(s):
         """Return a WaveType for a string repr"""
         if s=='wtb':  return WaveType.WTB
+        if s=='ssw':  return WaveType.SSAW
         return WaveType.OSC
 
 
@@ -107,7 +117,7 @@ class Patch:
         'wave' is one of Waves.waveform_types or a WAV filename
         """
         self.name = name
-        self.wave_type = wave_type  # WaveType.OSC or WaveType.WTB
+        self.wave_type = wave_type  # WaveType.OSC, WaveType.WTB or WaveType.SSAW
         self.wave = wave
         self.waveB = 'TRI'
         self.wave_mix = 0.0  # 0 = wave, 1 = waveB
@@ -122,6 +132,30 @@ class Patch:
         self.filt_env = filt_env_params or EnvParams()
         self.amp_env = amp_env_params or EnvParams()
         self.octave = 0
+        self._changed = set()  # names given to set() since pop_changes()
+
+    def set(self, name, val):
+        """
+        Set a patch attribute, or an envelope attribute with a dotted name
+        like "amp_env.attack_time", and record the name as changed if its
+        value is different, so an Instrument can apply only what changed.
+        """
+        obj, attr = self, name
+        if '.' in name:
+            envname, attr = name.split('.')
+            obj = getattr(self, envname)
+        if getattr(obj, attr) != val:
+            setattr(obj, attr, val)
+            self._changed.add(name)
+
+    def pop_changes(self):
+        """Return the set of names changed by set() and start a new set,
+        or None if nothing changed"""
+        if not self._changed:
+            return None
+        changed = self._changed
+        self._changed = set()
+        return changed
 
     def wave_select(self):
         """Construct a 'wave_select' string from patch parts.
@@ -4,36 +4,77 @@
 `patch_saver`
 ================================================================================
 
-Patch persistence (saving and loading) tools to and from JSON.
+Patch persistence (saving and loading) tools to and from JSON,
+or a compact binary format of fixed-size records.
 
 Part of synth_tools.
 
 """
 
+import binascii
 import json
+import os
+import struct
 import time
 
 from synth_tools.patch import Patch
 
 patches_save_fname = "/saved_patches.json"
+patches_bin_fname = "/saved_patches.bin"
+patches_journal_fname = "/saved_patches.jnl"
 
 last_write_time = time.monotonic()
 
 
+_schemas = {}  # class -> its fields, see _schema()
+
+def _schema(cls):
+    """
+    Get the fields to save of a class, found once per class by looking at
+    a default instance: a tuple of (name, child class) pairs, where child
+    class is None for simple (float, int, str) or unset props.
+    Class must have a zero-argument constructor.
+    """
+    schema = _schemas.get(cls)
+    if schema is None:
+        obj = cls()
+        fields = []
+        for p in sorted(set(dir(obj)) - set(dir(cls))):  # list of obj properties
+            if p.startswith('_'):  # private runtime state, not saved
+                continue
+            attr = getattr(obj, p)
+            if attr is None or isinstance(attr, (float,int,str)):
+                fields.append((p, None))
+            else:
+                fields.append((p, attr.__class__))
+        schema = tuple(fields)
+        _schemas[cls] = schema
+    return schema
+
 def to_dict(obj):
     """
     Turn an object into a dict, if it can, including subobjects.
     """
-    props = set(dir(obj)) - set(dir(obj.__class__))  # list of obj properties
     d = {}  # dict to hold props
-    for p in props:
-        d[p] = getattr(obj,p)
-        if d[p] is None:  # deal with unset properties
-            pass
-        elif not isinstance(d[p], (float,int,str)):
-            d[p] = to_dict(d[p])  # go deeper
+    for p, childcls in _schema(obj.__class__):
+        v = getattr(obj, p)
+        if childcls and v is not None:
+            v = to_dict(v)  # go deeper
+        d[p] = v
     return d
 
+def _fill(obj, d):
+    """Set the props of obj from dict d, filling in its subobjects in place"""
+    for p, childcls in _schema(obj.__class__):
+        if p not in d:
+            continue
+        v = d[p]
+        child = getattr(obj, p) if childcls else None
+        if child is not None and v is not None:
+            _fill(child, v)  # go deeper
+        else:
+            setattr(obj, p, v)
+
 def from_dict(d,cls):
     """
     Take a dict and class and create an object and fill out its props
@@ -41,22 +82,24 @@ def from_dict(d,cls):
     Class must have a zero-argument constructor
     """
     obj = cls()
-    for propname in d:
-        attr = getattr(obj,propname)   # obj attribute w/ name in p
-        if attr is None:
-            pass
-        elif isinstance(attr, (float,int,str)):
-            setattr(obj, propname, d[propname])  # can set directly if simple type
-        else:
-            # otherwise object, so get class of that obj
-            childcls = getattr(attr,'__class__')
-            setattr(obj, propname, from_dict(d[propname], childcls))  # go deeper
+    _fill(obj, d)
     return obj
 
+def _copy_into(dst, src):
+    """Copy the props of src into dst, and of their subobjects"""
+    for p, childcls in _schema(src.__class__):
+        v = getattr(src, p)
+        child = getattr(dst, p) if childcls else None
+        if child is not None and v is not None:
+            _copy_into(child, v)  # go deeper
+        else:
+            setattr(dst, p, v)
 
 def copy(obj):
-    """Copy an object, by passing it through dict space"""
-    return from_dict(to_dict(obj), obj.__class__)
+    """Copy an object, without going through dict space"""
+    new = obj.__class__()
+    _copy_into(new, obj)
+    return new
 
 
 def to_json(obj):
@@ -96,15 +139,20 @@ def load_patches(fname=patches_save_fname):
         print("load_patches: could not load", fname, "error:",e)
     return None  # if badness
 
+def _write_allowed(who):
+    """Only allow writes every 10 seconds, to save flash"""
+    global last_write_time
+    if time.monotonic() - last_write_time < 10:
+        print(who+": too soon, try later")
+        return False
+    last_write_time = time.monotonic()
+    return True
+
 def save_patches(patches, fname=patches_save_fname):
     """Write entire patch set from RAM to disk"""
-    global last_write_time
     print("save_patches: saving...")
-    # only allow writes every 10 seconds, to save flash
-    if time.monotonic() - last_write_time < 10: 
-        print("save_patches: too soon, try later")
+    if not _write_allowed("save_patches"):
         return
-    last_write_time = time.monotonic()
 
     patches_json_str = to_json(patches)
     #print("save_patches: patches_json_str:\n",patches_json_str)
@@ -118,6 +166,540 @@ def save_patches(patches, fname=patches_save_fname):
         
 
 
+# Binary patch files: an 8-byte header (PATCH_MAGIC, version, number of
+# fields, record size), a field table of (name, struct code) entries saying
+# what each record holds, then one fixed-size record per patch.
+# Loading goes by the file's field table, so files saved with a different
+# field list still load: unknown fields are skipped, missing ones keep
+# their Patch() defaults. Dotted names are envelope fields.
+# Strings are UTF-8, NUL-padded. A `name` too long for its field is cut
+# at a character boundary, other strings (wave names, paths) would no
+# longer match what they name, so saving refuses them with a ValueError.
+
+PATCH_MAGIC = b'PTCH'
+PATCH_VERSION = 1
+
+patch_fields = (
+    ('name', '16s'),
+    ('wave_type', 'B'),
+    ('wave', '16s'),
+    ('waveB', '16s'),  # empty string loads as None
+    ('wave_mix', 'f'),
+    ('wave_mix_lfo_amount', 'f'),
+    ('wave_mix_lfo_rate', 'f'),
+    ('wave_dir', '32s'),
+    ('detune', 'f'),
+    ('filt_type', '4s'),
+    ('filt_f', 'f'),
+    ('filt_q', 'f'),
+    ('filt_env_amount', 'f'),
+    ('filt_env.attack_time', 'f'),
+    ('filt_env.decay_time', 'f'),
+    ('filt_env.release_time', 'f'),
+    ('filt_env.attack_level', 'f'),
+    ('filt_env.sustain_level', 'f'),
+    ('amp_env.attack_time', 'f'),
+    ('amp_env.decay_time', 'f'),
+    ('amp_env.release_time', 'f'),
+    ('amp_env.attack_level', 'f'),
+    ('amp_env.sustain_level', 'f'),
+    ('octave', 'b'),
+)
+_known_fields = set(name for name, _ in patch_fields)
+_header_fmt = '<4sBBH'
+_field_entry_fmt = '<24s4s'
+
+def _fields_fmt(fields):
+    """struct format of a record with these fields"""
+    return '<' + ''.join(code for _, code in fields)
+
+def _get_field(obj, name):
+    """Get a patch field, going into the envelope for dotted names"""
+    if '.' in name:
+        envname, name = name.split('.')
+        obj = getattr(obj, envname)
+    return getattr(obj, name)
+
+def _set_field(obj, name, val):
+    """Set a patch field, going into the envelope for dotted names"""
+    if '.' in name:
+        envname, name = name.split('.')
+        obj = getattr(obj, envname)
+    setattr(obj, name, val)
+
+def _write_header(fp, magic=PATCH_MAGIC):
+    """Write a binary patch file header and field table,
+    returns the record format and a buffer for packing records"""
+    fmt = _fields_fmt(patch_fields)
+    buf = bytearray(struct.calcsize(fmt))
+    fp.write(struct.pack(_header_fmt, magic, PATCH_VERSION,
+                         len(patch_fields), len(buf)))
+    for name, code in patch_fields:
+        fp.write(struct.pack(_field_entry_fmt, name.encode(), code.encode()))
+    return fmt, buf
+
+def _read_header(fp, magic=PATCH_MAGIC):
+    """Read a binary patch file header and field table,
+    returns (fields, record format, record size, header size)"""
+    magic_in, version, num_fields, rec_size = struct.unpack(_header_fmt, fp.read(8))
+    if magic_in != magic or version > PATCH_VERSION:
+        raise ValueError("not a patch file")
+    entry_len = struct.calcsize(_field_entry_fmt)
+    fields = []
+    for _ in range(num_fields):
+        name, code = struct.unpack(_field_entry_fmt, fp.read(entry_len))
+        fields.append((name.split(b'\x00')[0].decode(), code.split(b'\x00')[0].decode()))
+    fmt = _fields_fmt(fields)
+    if struct.calcsize(fmt) != rec_size:
+        raise ValueError("bad patch record size")
+    return fields, fmt, rec_size, 8 + num_fields * entry_len
+
+def _encode_str(name, val, code):
+    """Encode a string field, cutting a too-long `name` at a character
+    boundary, and raising ValueError for any other too-long string"""
+    data = (val or '').encode()
+    size = int(code[:-1])
+    if len(data) <= size:
+        return data
+    if name != 'name':
+        raise ValueError("%s '%s' is longer than %d bytes" % (name, val, size))
+    while size and data[size] & 0xC0 == 0x80:  # don't cut a character in two
+        size -= 1
+    return data[:size]
+
+def _decode_str(data):
+    """Decode a NUL-padded string field, even one cut mid-character"""
+    data = bytes(data).split(b'\x00')[0]
+    for end in range(len(data), max(len(data) - 4, -1), -1):
+        try:  # files saved before names were cut cleanly end mid-character
+            return data[:end].decode()
+        except UnicodeError:
+            pass
+    return ''.join(chr(b) if b < 0x80 else '?' for b in data)
+
+def _pack_patch(patch, fmt, buf):
+    """Pack a patch into buf as a record of patch_fields,
+    raises ValueError if a string does not fit, see _encode_str()"""
+    vals = []
+    for name, code in patch_fields:
+        val = _get_field(patch, name)
+        if code.endswith('s'):
+            val = _encode_str(name, val, code)
+        vals.append(val)
+    struct.pack_into(fmt, buf, 0, *vals)
+
+def _unpack_patch(buf, fields, fmt):
+    """Make a Patch from a record with the given fields"""
+    patch = Patch()
+    for (name, code), val in zip(fields, struct.unpack_from(fmt, buf)):
+        if name not in _known_fields:  # from a newer field list
+            continue
+        if code.endswith('s'):
+            val = _decode_str(val) or None
+        _set_field(patch, name, val)
+    return patch
+
+def _write_patches_bin(patches, fname):
+    """Write patches to a binary patch file, a record at a time"""
+    with open(fname, 'wb') as fp:
+        fmt, buf = _write_header(fp)
+        for patch in patches:
+            _pack_patch(patch, fmt, buf)
+            fp.write(buf)
+
+def read_patches_bin(fname=patches_bin_fname):
+    """
+    Generator that reads a binary patch file a record at a time,
+    yielding a Patch for each, so the whole file is never in RAM.
+    """
+    with open(fname, 'rb') as fp:
+        fields, fmt, rec_size, _ = _read_header(fp)
+        buf = bytearray(rec_size)
+        while fp.readinto(buf) == rec_size:
+            yield _unpack_patch(buf, fields, fmt)
+
+def load_patches_bin(fname=patches_bin_fname):
+    """Read entire patch set from a binary patch file into RAM"""
+    print("load_patches_bin: loading...")
+    try:
+        patches = list(read_patches_bin(fname))
+        print("load_patches_bin: done")
+        return patches
+    except Exception as e:
+        print("load_patches_bin: could not load", fname, "error:",e)
+    return None  # if badness
+
+def save_patches_bin(patches, fname=patches_bin_fname):
+    """Write entire patch set from RAM to a binary patch file"""
+    print("save_patches_bin: saving...")
+    if not _write_allowed("save_patches_bin"):
+        return
+    try:
+        _write_patches_bin(patches, fname)
+    except Exception:
+        print("could not save patches, no boot.py?")
+    print("save_patches_bin: done")
+
+def json_to_bin(json_fname=patches_save_fname, bin_fname=patches_bin_fname):
+    """Convert a JSON patch file to a binary patch file, returns number of patches"""
+    patches = load_patches(json_fname)
+    if not patches:
+        return 0
+    _write_patches_bin(patches, bin_fname)
+    return len(patches)
+
+
+# Patch journals: the binary patch file header (with JOURNAL_MAGIC) and
+# field table, then entries of (patch index, crc32 of record) and a record.
+# The last entry for an index is that patch's saved state. An entry that
+# does not check out, from a power cut mid-write, ends the journal.
+
+JOURNAL_MAGIC = b'PJNL'
+_entry_head_fmt = '<HI'
+_entry_head_len = struct.calcsize(_entry_head_fmt)
+_name_len = struct.calcsize('<' + patch_fields[0][1])  # name is first
+
+def _exists(fname):
+    try:
+        os.stat(fname)
+        return True
+    except OSError:
+        return False
+
+class PatchJournal:
+    """
+    An append-only patch store. save() appends only the patches whose
+    record differs from what was last saved, so a knob change costs one
+    small record instead of rewriting the bank. Once the journal grows
+    past twice the size of one entry per patch (and past `compact_bytes`,
+    so small banks do not compact often), it is rewritten with one entry
+    per patch into a temporary file that then replaces it, and load()
+    recovers from a power cut at any point of that, or during an append.
+
+    scan() only indexes the journal: `offsets` of each patch's latest
+    record, and their `names`. read_patch() then reads one patch,
+    which is what `PatchBank` uses.
+    """
+
+    def __init__(self, fname=patches_journal_fname, compact_bytes=8*1024):
+        self.fname = fname
+        self.compact_bytes = compact_bytes
+        self.bytes_written = 0  # by the last save(), None if it failed
+        self.saved_indices = ()  # patches the last save() left saved
+        self.offsets = []  # file offset of each patch's latest record
+        self.names = []  # name of each patch
+        self._crcs = []  # crc32 of each patch's record, as last saved
+        self._size = 0  # length of the valid part of the journal
+        self._header_len = 0  # length of the journal's header
+        self._needs_compact = True  # no journal, torn tail or old fields
+        self._fields = self._fmt = None  # field table of the journal file
+        self._buf = None  # record buffer for read_patch()
+        self.error = None  # why the last scan() failed, None if it did not
+
+    def exists(self):
+        """True if there is a journal file, whether or not it can be read"""
+        return _exists(self.fname) or _exists(self.fname + ".tmp")
+
+    def _recover(self):
+        """Finish or undo a compaction that a power cut interrupted"""
+        tmp = self.fname + ".tmp"
+        if not _exists(tmp):
+            return
+        if _exists(self.fname):
+            os.remove(tmp)  # journal was not replaced yet, still good
+        else:
+            os.rename(tmp, self.fname)  # tmp was done, journal was removed
+
+    def scan(self):
+        """
+        Index the latest record of every patch in the journal without
+        making any Patches, returns the number of patches (0 if no journal).
+        If the journal could not be read, `error` says why: check exists()
+        before saving, as saving over an unreadable journal loses it.
+        """
+        self.error = None
+        try:
+            self._recover()
+            offsets, names, crcs = {}, {}, {}
+            with open(self.fname, 'rb') as fp:
+                fields, fmt, rec_size, size = _read_header(fp, JOURNAL_MAGIC)
+                name_fmt = None  # to unpack just the name from a record
+                field_names = [name for name, _ in fields]
+                if 'name' in field_names:
+                    i = field_names.index('name')
+                    skip = struct.calcsize(_fields_fmt(fields[:i]))
+                    name_fmt = '<' + ('%dx' % skip if skip else '') + fields[i][1]
+                head = bytearray(_entry_head_len)
+                buf = bytearray(rec_size)
+                header_len = size
+                while (fp.readinto(head) == _entry_head_len and
+                       fp.readinto(buf) == rec_size):
+                    idx, crc = struct.unpack(_entry_head_fmt, head)
+                    if binascii.crc32(buf) != crc:
+                        break
+                    offsets[idx] = size + _entry_head_len
+                    crcs[idx] = crc
+                    if name_fmt:
+                        names[idx] = _decode_str(struct.unpack_from(name_fmt, buf)[0])
+                    size += _entry_head_len + rec_size
+            self._needs_compact = (os.stat(self.fname)[6] != size or  # torn tail
+                                   fields != list(patch_fields))
+        except Exception as e:
+            print("PatchJournal.scan: could not scan", self.fname, "error:",e)
+            self.error = e
+            return 0
+        self._size = size
+        self._header_len = header_len
+        self._fields, self._fmt = fields, fmt
+        self._buf = bytearray(rec_size)
+        num_patches = max(offsets) + 1 if offsets else 0
+        self.offsets = [offsets.get(i) for i in range(num_patches)]
+        self.names = [names.get(i) for i in range(num_patches)]
+        self._crcs = [crcs.get(i) for i in range(num_patches)]
+        return num_patches
+
+    def read_patch(self, idx, fp=None):
+        """Read a single patch from the journal, using the index from scan()"""
+        offset = self.offsets[idx]
+        if offset is None:  # never saved
+            return Patch()
+        if fp is None:
+            with open(self.fname, 'rb') as fp:
+                return self.read_patch(idx, fp)
+        fp.seek(offset)
+        fp.readinto(self._buf)
+        return _unpack_patch(self._buf, self._fields, self._fmt)
+
+    def load(self):
+        """Read the latest saved state of every patch, or None if no journal"""
+        print("PatchJournal.load: loading...")
+        num_patches = self.scan()
+        if not num_patches:
+            return None
+        with open(self.fname, 'rb') as fp:
+            patches = [self.read_patch(i, fp) for i in range(num_patches)]
+        print("PatchJournal.load: done,", num_patches, "patches")
+        return patches
+
+    def changed(self, idx, patch):
+        """True if patch is different from the saved patch at idx,
+        or cannot be saved"""
+        fmt = _fields_fmt(patch_fields)
+        buf = bytearray(struct.calcsize(fmt))
+        try:
+            _pack_patch(patch, fmt, buf)
+        except ValueError:
+            return True
+        return idx >= len(self._crcs) or self._crcs[idx] != binascii.crc32(buf)
+
+    def save(self, patches, indices=None):
+        """
+        Save the patches that changed since the last save() or scan(),
+        returns the number of bytes written, or None if writing failed
+        or a patch could not be saved (a wave name too long, say), in
+        which case nothing is written.
+        Only the patches at `indices` are checked if given, all of them are
+        if the journal gets compacted. Afterwards, `saved_indices` holds the
+        indices of the patches that are now saved (none if writing failed).
+        """
+        for _ in self.save_steps(patches, indices):
+            pass
+        return self.bytes_written
+
+    def save_steps(self, patches, indices=None, chunk=4):
+        """
+        Generator that does what save() does, `chunk` patches at a time,
+        yielding how much of the save is done (0-1) after each chunk.
+        When done, `bytes_written` holds what save() returns,
+        and `saved_indices` is set like save() sets it.
+        """
+        fmt = _fields_fmt(patch_fields)
+        buf = bytearray(struct.calcsize(fmt))
+        entry_len = _entry_head_len + len(buf)
+        indices = range(len(patches)) if indices is None else indices
+        changed = []  # (index, crc, record)
+        self.bytes_written = None
+        self.saved_indices = ()
+        for n, i in enumerate(indices):
+            try:
+                _pack_patch(patches[i], fmt, buf)
+            except ValueError as e:
+                print("PatchJournal.save: patch", i, "can't be saved, nothing saved:", e)
+                yield 1.0
+                return
+            crc = binascii.crc32(buf)
+            if i >= len(self._crcs) or self._crcs[i] != crc:
+                changed.append((i, crc, bytes(buf)))
+            if n % chunk == chunk - 1:
+                yield n / len(indices) / 2  # checking is the first half
+        self.bytes_written = 0
+        try:
+            compacted = self._header_len + len(patches) * entry_len
+            if (self._needs_compact or self._size + len(changed) * entry_len >
+                    max(self.compact_bytes, 2 * compacted)):
+                yield from self._compact_steps(patches, fmt, buf, chunk)
+                indices = range(len(patches))
+            elif changed:
+                with open(self.fname, 'ab') as fp:
+                    for n, (i, crc, record) in enumerate(changed):
+                        fp.write(struct.pack(_entry_head_fmt, i, crc))
+                        fp.write(record)
+                        if n % chunk == chunk - 1:
+                            yield 0.5 + n / len(changed) / 2
+                self._index(changed, self._size, entry_len)
+                self.bytes_written = len(changed) * entry_len
+                self._size += self.bytes_written
+            self.saved_indices = indices
+        except OSError:
+            print("could not save patches, no boot.py?")
+            self.bytes_written = None
+            self._needs_compact = True  # a partial append is past _size
+        except ValueError as e:  # an unchecked patch, found by compaction
+            print("PatchJournal.save: a patch can't be saved, nothing saved:", e)
+            self.bytes_written = None
+        print("PatchJournal.save:", len(changed), "changed,", self.bytes_written, "bytes")
+        yield 1.0
+
+    async def save_async(self, patches, indices=None, chunk=4, progress=None):
+        """
+        Save like save(), yielding to the asyncio event loop after every
+        `chunk` patches, so other tasks keep running. If given, progress is
+        called with how much is done (0-1) each time. Returns the number of
+        bytes written (None if writing failed) and the longest time in
+        seconds between yields, including the time progress took.
+        """
+        import asyncio  # pylint: disable=import-outside-toplevel
+        max_stall = 0
+        t = time.monotonic()
+        for done in self.save_steps(patches, indices, chunk):
+            if progress:
+                progress(done)
+            max_stall = max(max_stall, time.monotonic() - t)
+            await asyncio.sleep(0)
+            t = time.monotonic()
+        return self.bytes_written, max_stall
+
+    def _index(self, entries, offset, entry_len):
+        """Add (index, crc, record) entries written from offset to the index"""
+        grow = max(e[0] for e in entries) + 1 - len(self.offsets) if entries else 0
+        if grow > 0:
+            self.offsets.extend([None] * grow)
+            self.names.extend([None] * grow)
+            self._crcs.extend([None] * grow)
+        for i, crc, record in entries:
+            self.offsets[i] = offset + _entry_head_len
+            self.names[i] = _decode_str(record[:_name_len])
+            self._crcs[i] = crc
+            offset += entry_len
+
+    def _compact_steps(self, patches, fmt, buf, chunk):
+        """Rewrite the journal with one entry per patch, a chunk at a time"""
+        tmp = self.fname + ".tmp"
+        entries = []
+        try:
+            with open(tmp, 'wb') as fp:
+                _write_header(fp, JOURNAL_MAGIC)
+                size = fp.tell()
+                for i in range(len(patches)):
+                    _pack_patch(patches[i], fmt, buf)
+                    crc = binascii.crc32(buf)
+                    fp.write(struct.pack(_entry_head_fmt, i, crc))
+                    fp.write(buf)
+                    entries.append((i, crc, buf[:_name_len]))
+                    if i % chunk == chunk - 1:
+                        yield 0.5 + i / len(patches) / 2
+        except ValueError:
+            os.remove(tmp)  # else _recover() could take it for a finished one
+            raise
+        if _exists(self.fname):
+            os.remove(self.fname)
+        os.rename(tmp, self.fname)
+        self.offsets, self.names, self._crcs = [], [], []
+        self._index(entries, size, _entry_head_len + len(buf))
+        self._header_len = size
+        self._size = size + len(entries) * (_entry_head_len + len(buf))
+        self.bytes_written = self._size
+        self._fields, self._fmt = list(patch_fields), fmt
+        self._buf = bytearray(len(buf))
+        self._needs_compact = False
+
+
+class PatchBank:
+    """
+    List-like, read-on-demand access to the patches of a `PatchJournal`.
+    Only the journal's index (offsets and names) is kept at startup, and
+    a Patch is read when first indexed. Like a list's items, every Patch
+    handed out by indexing is kept and checked for changes by save(), so
+    edits to it are never lost, however long ago it was indexed. So RAM
+    grows only with the patches actually indexed, not with the bank.
+    peek() reads a patch without keeping it, for a look, and forget()
+    lets go of saved patches that are no longer in use.
+    """
+
+    def __init__(self, journal):
+        self.journal = journal
+        self._patches = {}  # index -> Patch handed out by indexing
+        self._saving = False  # while saving, indexing does not keep patches
+        journal.scan()
+
+    def __len__(self):
+        return len(self.journal.offsets)
+
+    def __getitem__(self, idx):
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError("patch index out of range")
+        patch = self._patches.get(idx)
+        if patch is None:
+            if self._saving:
+                return self.peek(idx)
+            patch = self.journal.read_patch(idx)
+            self._patches[idx] = patch
+        return patch
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def peek(self, idx):
+        """Get a patch without keeping it, for a quick look"""
+        return self._patches.get(idx) or self.journal.read_patch(idx)
+
+    def forget(self, keep=()):
+        """Let go of the indexed patches that are saved, except the ones at
+        indices in `keep`. Edits to a forgotten Patch are not saved, so only
+        forget patches no one holds on to. Returns how many were let go."""
+        forgotten = [idx for idx, patch in self._patches.items()
+                     if idx not in keep and not self.journal.changed(idx, patch)]
+        for idx in forgotten:
+            del self._patches[idx]
+        return len(forgotten)
+
+    @property
+    def names(self):
+        """Names of all patches, without reading them"""
+        return self.journal.names
+
+    def save(self):
+        """Save the indexed patches that changed, returns bytes written
+        or None if writing failed, in which case they stay unsaved"""
+        self._saving = True
+        try:
+            return self.journal.save(self, list(self._patches))
+        finally:
+            self._saving = False
+
+    async def save_async(self, chunk=4, progress=None):
+        """Save like save() without blocking the asyncio event loop,
+        returns what `PatchJournal.save_async()` does"""
+        self._saving = True
+        try:
+            return await self.journal.save_async(self, list(self._patches), chunk, progress)
+        finally:
+            self._saving = False
+
+
 def test():
     patch = Patch()
     json_str = to_json(patch)
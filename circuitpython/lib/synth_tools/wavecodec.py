@@ -0,0 +1,209 @@
+# SPDX-FileCopyrightText: Copyright (c) 2024 Tod Kurt
+# SPDX-License-Identifier: MIT
+"""
+`wavecodec`
+================================================================================
+
+Compact encodings for wavetable waves, used by `WaveBank` files.
+Each wave (e.g. 256 samples) is encoded on its own, so any single wave
+can be decoded without decoding the ones before it.
+
+* `CODEC_PCM16` - plain int16 samples, 2 bytes/sample
+* `CODEC_ULAW8` - 8-bit mu-law, 1 byte/sample
+* `CODEC_ADPCM4` - 4-bit IMA ADPCM, 1/2 byte/sample plus a 2-byte header
+* `CODEC_BLOCK4` - 4-bit samples scaled per block of `BLOCK4_SIZE`,
+  1/2 byte/sample plus a scale byte per block
+
+ADPCM decodes a sample at a time in Python, and its quality depends a lot
+on the wavetable. Block4 is about as small, keeps a steadier quality and
+`waves` decodes it with a few ulab array operations.
+
+This module is pure Python so the encoders can also be used on the host
+by `wavesynth/make_wavebank.py`.
+
+Part of synth_tools.
+
+"""
+
+import math
+
+CODEC_PCM16 = 0
+CODEC_ULAW8 = 1
+CODEC_ADPCM4 = 2
+CODEC_BLOCK4 = 3
+
+codec_names = ('pcm16', 'ulaw8', 'adpcm4', 'block4')
+
+BLOCK4_SIZE = 16  # samples per block4 scale byte
+
+_ULAW_MU = 255
+
+_ADPCM_INDEX_TABLE = (-1, -1, -1, -1, 2, 4, 6, 8)
+
+_ADPCM_STEP_TABLE = (
+    7, 8, 9, 10, 11, 12, 13, 14, 16, 17, 19, 21, 23, 25, 28, 31, 34, 37, 41,
+    45, 50, 55, 60, 66, 73, 80, 88, 97, 107, 118, 130, 143, 157, 173, 190,
+    209, 230, 253, 279, 307, 337, 371, 408, 449, 494, 544, 598, 658, 724,
+    796, 876, 963, 1060, 1166, 1282, 1411, 1552, 1707, 1878, 2066, 2272,
+    2499, 2749, 3024, 3327, 3660, 4026, 4428, 4871, 5358, 5894, 6484, 7132,
+    7845, 8630, 9493, 10442, 11487, 12635, 13899, 15289, 16818, 18500,
+    20350, 22385, 24623, 27086, 29794, 32767)
+
+def wave_bytes(codec, size):
+    """Number of bytes one encoded wave of `size` samples takes"""
+    if codec == CODEC_ULAW8:
+        return size
+    if codec == CODEC_ADPCM4:
+        return 2 + size // 2
+    if codec == CODEC_BLOCK4:
+        return size // BLOCK4_SIZE + size // 2
+    return size * 2
+
+def ulaw_decode_table():
+    """List of the 256 int16 sample values for each 8-bit mu-law code"""
+    table = []
+    for code in range(256):
+        c = code - 256 if code > 127 else code
+        y = abs(c) / 127
+        x = ((1 + _ULAW_MU) ** y - 1) / _ULAW_MU * 32767
+        table.append(max(int(-x if c < 0 else x), -32768))  # -128 is unused
+    return table
+
+def ulaw_encode(samples):
+    """Encode a list of int16 samples to 8-bit mu-law bytes"""
+    out = bytearray(len(samples))
+    for i, s in enumerate(samples):
+        x = min(abs(s) / 32767, 1.0)
+        c = round(math.log(1 + _ULAW_MU * x) / math.log(1 + _ULAW_MU) * 127)
+        out[i] = (-c if s < 0 else c) & 0xff
+    return out
+
+def adpcm_decode_into(out, data, size):
+    """Decode one 4-bit IMA ADPCM wave in `data` into `out` (size samples)"""
+    h = data[0] | (data[1] << 8)
+    if h > 32767:
+        h -= 65536
+    index = h & 0x7f   # low 7 bits are the starting step index,
+    pred = h & ~0x7f   # the rest is the starting sample value
+    step = _ADPCM_STEP_TABLE[index]
+    for i in range(size):
+        b = data[2 + (i >> 1)]
+        code = (b >> 4) if (i & 1) else (b & 0x0f)
+        diff = step >> 3
+        if code & 4: diff += step
+        if code & 2: diff += step >> 1
+        if code & 1: diff += step >> 2
+        pred = pred - diff if code & 8 else pred + diff
+        pred = min(max(pred, -32768), 32767)
+        out[i] = pred
+        index = min(max(index + _ADPCM_INDEX_TABLE[code & 7], 0), 88)
+        step = _ADPCM_STEP_TABLE[index]
+    return out
+
+def _adpcm_encode_from(samples, index):
+    """Encode samples starting from a given step index"""
+    pred = min((samples[0] + 64) & ~0x7f, 32767 & ~0x7f)
+    h = (pred | index) & 0xffff
+    out = bytearray(2 + (len(samples) + 1) // 2)
+    out[0], out[1] = h & 0xff, h >> 8
+    step = _ADPCM_STEP_TABLE[index]
+    for i, s in enumerate(samples):
+        delta = s - pred
+        code = 8 if delta < 0 else 0
+        delta = abs(delta)
+        diff = step >> 3
+        if delta >= step: code |= 4; delta -= step; diff += step
+        if delta >= step >> 1: code |= 2; delta -= step >> 1; diff += step >> 1
+        if delta >= step >> 2: code |= 1; diff += step >> 2
+        pred = pred - diff if code & 8 else pred + diff
+        pred = min(max(pred, -32768), 32767)
+        out[2 + (i >> 1)] |= (code << 4) if (i & 1) else code
+        index = min(max(index + _ADPCM_INDEX_TABLE[code & 7], 0), 88)
+        step = _ADPCM_STEP_TABLE[index]
+    return out
+
+def adpcm_encode(samples):
+    """
+    Encode one wave of int16 samples to 4-bit IMA ADPCM, searching for the
+    starting step index with least error (slow, for host use)
+    """
+    decoded = [0] * len(samples)
+    def encode_err(index):
+        enc = _adpcm_encode_from(samples, index)
+        adpcm_decode_into(decoded, enc, len(samples))
+        return sum((a - b) ** 2 for a, b in zip(samples, decoded)), enc
+    # coarse search, then refine around the best coarse index
+    best_index = min(range(0, 89, 4), key=lambda i: encode_err(i)[0])
+    fine = range(max(best_index - 3, 0), min(best_index + 4, 89))
+    return min((encode_err(i) for i in fine), key=lambda e: e[0])[1]
+
+def block4_step(scale):
+    """Quantizer step size of a block4 scale byte"""
+    return 2 ** (scale / 8)
+
+def block4_encode(samples):
+    """
+    Encode one wave of int16 samples to block4: a scale byte for each block
+    of BLOCK4_SIZE samples, then the samples as 4-bit values (-8 to 7)
+    times their block's step, two per byte, low nibble first
+    """
+    num_blocks = len(samples) // BLOCK4_SIZE
+    out = bytearray(num_blocks + len(samples) // 2)
+    for blk in range(num_blocks):
+        block = samples[blk * BLOCK4_SIZE : (blk+1) * BLOCK4_SIZE]
+        peak = max(max(block), -min(block) * 7 / 8, 1)
+        # smallest step that fits the block, or a step or two bigger
+        scale = max(0, min(math.ceil(8 * math.log2(peak / 7)), 127))
+        best = None
+        for s in range(scale, min(scale + 3, 128)):
+            step = block4_step(s)
+            codes = [min(max(round(x / step), -8), 7) for x in block]
+            err = sum((x - c * step) ** 2 for x, c in zip(block, codes))
+            if best is None or err < best[0]:
+                best = (err, s, codes)
+        _, scale, codes = best
+        out[blk] = scale
+        for i, c in enumerate(codes):
+            pos = num_blocks + (blk * BLOCK4_SIZE + i) // 2
+            out[pos] |= (c & 0x0f) << 4 if i & 1 else (c & 0x0f)
+    return out
+
+def block4_decode(data, size):
+    """Decode one block4 wave to a list of int16 samples (slow, for host use)"""
+    num_blocks = size // BLOCK4_SIZE
+    vals = []
+    for i in range(size):
+        b = data[num_blocks + i // 2]
+        c = (b >> 4) if i & 1 else (b & 0x0f)
+        c = c - 16 if c > 7 else c
+        v = int(c * block4_step(data[i // BLOCK4_SIZE]))
+        vals.append(min(max(v, -32768), 32767))
+    return vals
+
+def encode_wave(samples, codec):
+    """Encode one wave of int16 samples (a list) with the given codec"""
+    if codec == CODEC_ULAW8:
+        return ulaw_encode(samples)
+    if codec == CODEC_ADPCM4:
+        return adpcm_encode(samples)
+    if codec == CODEC_BLOCK4:
+        return block4_encode(samples)
+    out = bytearray(len(samples) * 2)
+    for i, s in enumerate(samples):
+        out[2*i], out[2*i+1] = s & 0xff, (s >> 8) & 0xff
+    return out
+
+def decode_wave(data, codec, size):
+    """Decode one encoded wave to a list of int16 samples (slow, for host use)"""
+    if codec == CODEC_ULAW8:
+        table = ulaw_decode_table()
+        return [table[b] for b in data[:size]]
+    if codec == CODEC_ADPCM4:
+        return adpcm_decode_into([0] * size, data, size)
+    if codec == CODEC_BLOCK4:
+        return block4_decode(data, size)
+    vals = []
+    for i in range(size):
+        v = data[2*i] | (data[2*i+1] << 8)
+        vals.append(v - 65536 if v > 32767 else v)
+    return vals
@@ -9,14 +9,23 @@
 `Waves` is a set of waveform construction tools for `synthio`.
 `Wavetable` uses `Waves` to create a Wavetable waveform for `Instrument`
 that can load arbitrary two waveforms and mix between them.
+`WaveCache` keeps recently used wavetable frames in RAM, shared by
+all `Wavetable`s, so switching back to a wavetable needs no file access.
+`WaveBank` reads wavetables packed into a single file by `make_wavebank.py`,
+optionally compressed with one of the `wavecodec` codecs.
 
 Part of synth_tools.
 
 """
 
 import random
+import struct
+from collections import OrderedDict
 import ulab.numpy as np
 import adafruit_wave
+from synth_tools.wavecodec import (CODEC_PCM16, CODEC_ULAW8, CODEC_ADPCM4, CODEC_BLOCK4,
+                                   BLOCK4_SIZE, wave_bytes, ulaw_decode_table,
+                                   adpcm_decode_into, block4_step)
 
 """ mix between values a and b, works with numpy arrays too,  t ranges 0-1"""
 def lerp(a, b, t):  return (1-t)*a + t*b  # pylint: disable=missing-function-docstring
@@ -29,6 +38,90 @@ class Waves:
 
     waveform_types = ('SIN', 'SQU', 'SAW', 'TRI', 'SIL', 'NZE')
 
+    _shared_waveforms = {}  # (waveid, size, volume) -> waveform
+
+    @staticmethod
+    def shared_waveform(waveid, size=512, volume=32767//2):
+        """
+        Return a waveform by string name like `make_waveform()`, but made
+        only once and shared by every caller asking for the same
+        (waveid, size, volume). Treat it as read-only: use `copy_waveform()`
+        to get a buffer that can be written to.
+        """
+        key = (waveid.upper()[:3], size, volume)  # 'SQUARE' -> 'SQU', etc
+        wavef = Waves._shared_waveforms.get(key)
+        if wavef is None:
+            wavef = Waves.make_waveform(waveid, size, volume)
+            if wavef is not None:
+                Waves._shared_waveforms[key] = wavef
+        return wavef
+
+    supersaw_size = 1024  # samples in a shared supersaw table
+
+    @staticmethod
+    def supersaw_cycles(size, spread):
+        """
+        Cycles of the center saw in a supersaw table of `size` samples for
+        `spread` (0-1): from size/32 cycles (the least detune, keeping 32
+        samples per cycle) down to half of that, but never under 16, so
+        the outer saws of a 7-saw table still have 13 cycles or more.
+        1 at spread=0.
+        """
+        if spread <= 0:
+            return 1
+        most = max(size // 32, 16)
+        return max(int(most * 0.5 ** spread + 0.5), 16)
+
+    @staticmethod
+    def supersaw(size, volume, spread, num_saws=7):
+        """
+        Supersaw waveform: num_saws detuned saws in one table. The table
+        holds `supersaw_cycles(size, spread)` cycles of the center saw, and
+        the saws around it have 1, 2, 3... cycles more or less, with their
+        phases spread across the cycle, normalized to volume. Play it at
+        frequency / cycles: neighbouring saws are then detuned by 1/cycles
+        of the note's frequency from each other, and beat like real unison
+        saws. At spread=0 it is a plain saw.
+        """
+        cycles = Waves.supersaw_cycles(size, spread)
+        if cycles == 1:
+            return Waves.saw(size, volume)
+        ramp = np.arange(size) / size
+        wavef = np.zeros(size, dtype=np.float)
+        for i in range(num_saws):
+            phase = ramp * (cycles + i - num_saws // 2) + i / num_saws
+            wavef += 1 - 2 * (phase - np.floor(phase))  # falling, like saw()
+        wavef = wavef * (volume / max(np.max(np.abs(wavef)), 1))
+        return np.array(wavef, dtype=np.int16)
+
+    @staticmethod
+    def shared_supersaw(spread_step, num_steps=8, size=supersaw_size, volume=32767//2):
+        """
+        Return a shared (read-only) supersaw for one of num_steps spread
+        settings, made once per setting like `shared_waveform()`.
+        Play it at frequency / `supersaw_cycles(size, spread_step / (num_steps-1))`
+        Making one allocates several float temporaries of `size`, so do it
+        when loading a patch, not in a control loop. The tables are kept
+        for good, at most num_steps * size * 2 bytes (16 KB by default).
+        """
+        key = ('SSAW', spread_step, num_steps, size, volume)
+        wavef = Waves._shared_waveforms.get(key)
+        if wavef is None:
+            wavef = Waves.supersaw(size, volume, spread_step / (num_steps-1))
+            Waves._shared_waveforms[key] = wavef
+        return wavef
+
+    @staticmethod
+    def copy_waveform(src, dst=None):
+        """
+        Copy a (maybe shared) waveform src into working buffer dst,
+        reusing dst if it is the right size. Returns the working buffer.
+        """
+        if dst is None or len(dst) != len(src):
+            return np.array(src, dtype=np.int16)
+        dst[:] = src
+        return dst
+
     @staticmethod
     def make_waveform(waveid, size=512, volume=32767//2):
         """Return a waveform by string name, one of `waveform_types`"""
@@ -90,8 +183,11 @@ class Waves:
 
     @staticmethod
     def noise(size,volume):
-        """White noise waveform (from random.randint)"""
-        return np.array([random.randint(-volume, volume) for i in range(size)], dtype=np.int16)
+        """White noise waveform (vectorized hash noise, seeded from random)"""
+        x = (np.arange(size) + random.random() * size) * 12.9898
+        x = np.sin(x) * 4375.85453
+        x = x - np.floor(x)  # fractional part, 0-1
+        return np.array((x * 2 - 1) * volume, dtype=np.int16)
 
     @staticmethod
     def from_list( vals ):
@@ -161,6 +257,251 @@ class Waves:
             return (w.getnframes(), w.getnchannels(), w.getsampwidth())
 
 
+class WaveCache:
+    """
+    A process-wide cache of wavetable frames, keyed by (filepath, frame index),
+    with a RAM budget in bytes. When the budget is exceeded the least
+    recently used frames are evicted. Also remembers the frame count of each
+    WAV file seen so a cached `Wavetable` can be re-created without opening
+    its file. Use the module-level `wave_cache` rather than making your own.
+    """
+
+    def __init__(self, max_bytes=32*1024):
+        self.max_bytes = max_bytes
+        self.num_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.frames = OrderedDict()  # oldest first
+        self.nframes = {}  # filepath -> number of samples in WAV
+
+    def get(self, filepath, frame_idx):
+        """Return a cached frame, or None. A hit marks it most recently used"""
+        key = (filepath, frame_idx)
+        frame = self.frames.pop(key, None)
+        if frame is None:
+            self.misses += 1
+            return None
+        self.frames[key] = frame  # re-insert at the newest end
+        self.hits += 1
+        return frame
+
+    def put(self, filepath, frame_idx, frame):
+        """Add a frame to the cache, evicting old frames to stay in budget"""
+        key = (filepath, frame_idx)
+        old = self.frames.pop(key, None)
+        if old is not None:
+            self.num_bytes -= len(old) * 2
+        self.frames[key] = frame
+        self.num_bytes += len(frame) * 2
+        while self.num_bytes > self.max_bytes and len(self.frames) > 1:
+            oldkey = next(iter(self.frames))
+            self.num_bytes -= len(self.frames.pop(oldkey)) * 2
+
+    def clear(self):
+        """Drop all cached frames and reset the hit/miss counts"""
+        self.frames = OrderedDict()
+        self.num_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __repr__(self):
+        return "WaveCache(frames=%d, bytes=%d/%d, hits=%d, misses=%d)" % (
+            len(self.frames), self.num_bytes, self.max_bytes,
+            self.hits, self.misses)
+
+""" The wavetable frame cache shared by all Wavetables """
+wave_cache = WaveCache()
+
+
+class WaveBank:
+    """
+    A bank of wavetables packed into a single file, made from a directory
+    of WAVs with `wavesynth/make_wavebank.py`. Avoids WAV header parsing
+    and directory scans: the index is read once when the bank is opened.
+
+    File layout, all little-endian:
+      header: b'WTBK', version (u8), number of tables (u8), wave size (u16)
+              (version 2 and up) codec (u8), 3 bytes padding
+      index:  for each table: name (16 bytes, zero-padded),
+              number of samples (u32), byte offset of samples in file (u32)
+              (version 3 only) the table's codec (u8), 3 bytes padding
+      data:   waves of each table, as int16 samples or encoded with
+              the table's codec (the bank's `codec` before version 3)
+    """
+
+    MAGIC = b'WTBK'
+    NAME_LEN = 16
+
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self.f = open(filepath, 'rb')
+        magic, version, num_tables, self.wave_size = struct.unpack('<4sBBH', self.f.read(8))
+        if magic != WaveBank.MAGIC or version not in (1, 2, 3):
+            self.f.close()
+            raise ValueError("not a wave bank")
+        self.codec = CODEC_PCM16
+        if version >= 2:
+            self.codec = self.f.read(4)[0]
+        self._wave_buf = bytearray(self.wave_size * 2)  # for decoding a wave
+        self.names = []
+        self.tables = {}  # name -> (nframes, offset, codec)
+        entry_fmt = ('<%dsIIBxxx' if version == 3 else '<%dsII') % WaveBank.NAME_LEN
+        entry_len = struct.calcsize(entry_fmt)
+        for _ in range(num_tables):
+            entry = struct.unpack(entry_fmt, self.f.read(entry_len))
+            name = entry[0].split(b'\x00')[0].decode()
+            codec = entry[3] if version == 3 else self.codec
+            self.names.append(name)
+            self.tables[name] = (entry[1], entry[2], codec)
+
+    def __contains__(self, name):
+        return name in self.tables
+
+    def nframes(self, name):
+        """Number of samples in the named wavetable"""
+        return self.tables[name][0]
+
+    def table_codec(self, name):
+        """The `wavecodec` codec the named wavetable is stored with"""
+        return self.tables[name][2]
+
+    def wave_bytes(self, name):
+        """Bytes taken by each (maybe encoded) wave of the named wavetable"""
+        return wave_bytes(self.tables[name][2], self.wave_size)
+
+    def table_bytes(self, name):
+        """Number of bytes the named wavetable takes in the bank"""
+        return self.tables[name][0] // self.wave_size * self.wave_bytes(name)
+
+    def readinto(self, buf, name, frame_pos=0):
+        """
+        Read samples of the named wavetable, starting at sample frame_pos,
+        into buf (an int16 ndarray or bytearray), filling all of buf.
+        For compressed banks, the encoded bytes are read and
+        frame_pos must be at the start of a wave.
+        """
+        _, offset, codec = self.tables[name]
+        if codec == CODEC_PCM16:
+            offset += frame_pos * 2
+        else:
+            offset += frame_pos // self.wave_size * wave_bytes(codec, self.wave_size)
+        self.f.seek(offset)
+        return self.f.readinto(buf)
+
+    def read_wave_into(self, out, name, wave_idx):
+        """Read and decode a single wave of the named wavetable into int16 ndarray out"""
+        codec = self.tables[name][2]
+        if codec == CODEC_PCM16:
+            return self.readinto(out, name, wave_idx * self.wave_size)
+        data = memoryview(self._wave_buf)[:wave_bytes(codec, self.wave_size)]
+        self.readinto(data, name, wave_idx * self.wave_size)
+        return decode_wave_into(out, data, codec)
+
+    def deinit(self):
+        """Close the wave bank file"""
+        self.f.close()
+
+_ulaw_table = None
+_block4_tables = None
+_block4_bufs = {}  # wave size -> (sample block index, float scratch)
+
+def _block4_decode_into(out, data):
+    """
+    Decode a block4 wave into out with ulab array ops, no per-sample Python:
+    nibbles to levels and scale bytes to steps are both table lookups
+    """
+    global _block4_tables  # pylint: disable=global-statement
+    if _block4_tables is None:
+        lo = [(b & 0x0f) - 16 * ((b >> 3) & 1) for b in range(256)]
+        hi = [(b >> 4) - 16 * (b >> 7) for b in range(256)]
+        steps = [block4_step(s) for s in range(256)]
+        _block4_tables = (np.array(lo, dtype=np.float), np.array(hi, dtype=np.float),
+                          np.array(steps, dtype=np.float))
+    lo, hi, steps = _block4_tables
+    size = len(out)
+    if size not in _block4_bufs:
+        blocks = np.array([i // BLOCK4_SIZE for i in range(size)], dtype=np.uint16)
+        _block4_bufs[size] = (blocks, np.zeros(size, dtype=np.float))
+    blocks, vals = _block4_bufs[size]
+    num_blocks = size // BLOCK4_SIZE
+    raw = np.frombuffer(data, dtype=np.uint8)
+    nibbles = raw[num_blocks:]
+    vals[0::2] = np.take(lo, nibbles)
+    vals[1::2] = np.take(hi, nibbles)
+    vals *= np.take(np.take(steps, raw[:num_blocks]), blocks)
+    out[:] = np.clip(vals, -32768, 32767)
+    return out
+
+def decode_wave_into(out, data, codec):
+    """Decode one wave encoded with a `wavecodec` codec into int16 ndarray out"""
+    global _ulaw_table  # pylint: disable=global-statement
+    if codec == CODEC_ULAW8:
+        if _ulaw_table is None:
+            _ulaw_table = np.array(ulaw_decode_table(), dtype=np.int16)
+        out[:] = np.take(_ulaw_table, np.frombuffer(data, dtype=np.uint8))
+    elif codec == CODEC_BLOCK4:
+        _block4_decode_into(out, data)
+    elif codec == CODEC_ADPCM4:
+        adpcm_decode_into(out, data, len(out))
+    else:
+        out[:] = np.frombuffer(data, dtype=np.int16)
+    return out
+
+""" Filename of a wave bank file inside a wavetable directory """
+WAVEBANK_FILENAME = "wavebank.bin"
+
+_wave_banks = {}
+
+def open_wave_bank(wave_dir):
+    """
+    Return the WaveBank in wave_dir, opening it only the first time,
+    or None if wave_dir has no wave bank file
+    """
+    if wave_dir not in _wave_banks:
+        try:
+            _wave_banks[wave_dir] = WaveBank(wave_dir + "/" + WAVEBANK_FILENAME)
+        except (OSError, ValueError):
+            _wave_banks[wave_dir] = None
+    return _wave_banks[wave_dir]
+
+def warm_wave_cache(filepath, wave_mix, size=256, bank=None):
+    """
+    Read the waves a Wavetable of filepath (or of the table named filepath
+    in `bank`) will want first into `wave_cache`: the first two, where it
+    starts, and the two around wave_mix (0-1) along the table.
+    Waves already cached are skipped. Returns the number of bytes read.
+    """
+    key = bank.filepath + ":" + filepath if bank else filepath
+    w = None
+    if bank:
+        nframes = bank.nframes(filepath)
+    else:
+        nframes = wave_cache.nframes.get(key)
+        if nframes is None:
+            w = adafruit_wave.open(filepath)
+            nframes = w.getnframes()
+            wave_cache.nframes[key] = nframes
+    last = nframes // size - 1
+    pos = min(int(wave_mix * (last+1)), last)
+    num_bytes = 0
+    for wave_idx in (0, min(1, last), pos, min(pos+1, last)):
+        if (key, wave_idx) in wave_cache.frames:
+            continue
+        if bank:
+            wave = np.zeros(size, dtype=np.int16)
+            bank.read_wave_into(wave, filepath, wave_idx)
+        else:
+            if w is None:
+                w = adafruit_wave.open(filepath)
+            w.setpos(wave_idx * size)
+            wave = np.frombuffer(w.readframes(size), dtype=np.int16)
+        wave_cache.put(key, wave_idx, wave)
+        num_bytes += size * 2
+    if w:
+        w.close()
+    return num_bytes
+
+
 class Wavetable:
     """
     A 'waveform' for synthio.Note that uses a wavetable with a scannable
@@ -180,26 +521,103 @@ class Wavetable:
     of +/-16383 instead of +/-32767 to provide from summing headroom
     when doing multiple voices (synthio tries to do this, but I still
     experience clipping)
+
+    When not `in_memory`, waves are read through `wave_cache`, and the WAV
+    file is only opened when a wave is not already in the cache.
+    A small ring of `ring_size` waves is also kept: one behind the current
+    wave position, and the rest at and ahead of it in the direction the
+    position is moving, which is the part `prefetch()` fills.
+    `stalls` counts waves `set_wave_pos()` had to read from the file,
+    `prefetch_hits` counts waves it found already in the ring.
+
+    If `bank` is a `WaveBank`, `filepath` is instead the name of a
+    wavetable in that bank. If that bank is compressed and `in_memory` is set,
+    the table is kept compressed in RAM and only the two waves being mixed
+    are decoded, when the wave position moves to a new wave.
     """
 
-    def __init__(self, filepath, size=256, in_memory=False):
+    def __init__(self, filepath, size=256, in_memory=False, inplace_mix=True,
+                 ring_size=6, bank=None):
+        self.bank = bank
+        self.bank_name = filepath
+        if bank:
+            filepath = bank.filepath + ":" + filepath  # wave_cache key
         self.filepath = filepath
         """Sample size of each wave in the table"""
         self.size = size
-        self.w = adafruit_wave.open(filepath)
-        if self.w.getsampwidth() != 2 or self.w.getnchannels() != 1:
-            raise ValueError("unsupported WAV format")
+        self.ring_size = ring_size
+        self._ring = {}  # wave index -> wave, around current position
+        self._direction = 1  # which way the wave position last moved
+        self.stalls = 0
+        self.prefetch_hits = 0
+        self.w = None
         self.wav = None
+        self.packed = None  # compressed table, if in_memory from compressed bank
+        nframes = wave_cache.nframes.get(filepath)
+        if bank:
+            nframes = bank.nframes(self.bank_name)
+        elif in_memory or nframes is None:
+            self._open()
+            nframes = self.w.getnframes()
+            wave_cache.nframes[filepath] = nframes
         if in_memory:  # load entire WAV into RAM
-            self.wav = np.frombuffer(self.w.readframes(self.w.getnframes()), dtype=np.int16)
+            if bank and bank.table_codec(self.bank_name) != CODEC_PCM16:
+                self.packed = bytearray(bank.table_bytes(self.bank_name))
+                bank.readinto(self.packed, self.bank_name)
+                self._unpackedA = np.zeros(size, dtype=np.int16)
+                self._unpackedB = np.zeros(size, dtype=np.int16)
+            elif bank:
+                self.wav = np.zeros(nframes, dtype=np.int16)
+                bank.readinto(self.wav, self.bank_name)
+            else:
+                self.wav = np.frombuffer(self.w.readframes(nframes), dtype=np.int16)
         self.samp_posA = -1
 
         """How many waves in this wavetable"""
-        self.num_waves = self.w.getnframes() / self.size
+        self.num_waves = nframes / self.size
         """ The waveform to be used by synthio.Note """
         self.waveform = Waves.silence(size) # makes a buffer for us to lerp into
+
+        # scratch buffers for the in-place crossfade, allocated once here
+        # so set_wave_pos() does not create any new arrays when mixing
+        self.inplace_mix = inplace_mix
+        self._mix_frac = -1
+        if inplace_mix:
+            self._half_a = np.zeros(size, dtype=np.float)  # waveA/2
+            self._delta = np.zeros(size, dtype=np.float)   # (waveB-waveA)/2
+            self._mix = np.zeros(size, dtype=np.float)     # working mix
+        self.morph_frames = None  # see precompute_morph()
+        self._voice_a = self._voice_b = None  # see mix_into()
         self.set_wave_pos(0)
 
+    def precompute_morph(self, pos_min, pos_max, steps_per_wave=8, max_bytes=16*1024):
+        """
+        Precompute the mixed waveforms between wave positions pos_min and
+        pos_max, quantized to steps_per_wave mixes per wave, so set_wave_pos()
+        within that range only copies a ready-made waveform.
+        Fewer steps per wave are used if needed to stay within max_bytes.
+        Positions outside the range are still mixed as normal.
+        """
+        self.morph_frames = None
+        pos_min = min(max(pos_min, 0), self.num_waves-1)
+        pos_max = min(max(pos_max, pos_min), self.num_waves-1)
+        max_frames = max_bytes // (self.size * 2)
+        span = pos_max - pos_min
+        if span * steps_per_wave + 1 > max_frames:
+            steps_per_wave = (max_frames - 1) / span
+        num_frames = int(span * steps_per_wave) + 1
+        if num_frames < 2:
+            return
+        frames = np.zeros((num_frames, self.size), dtype=np.int16)
+        for i in range(num_frames):
+            self.set_wave_pos(pos_min + i / steps_per_wave)
+            frames[i, :] = self.waveform
+        self.morph_pos_min = pos_min
+        self.morph_steps = steps_per_wave
+        self.morph_idx = -1
+        self.morph_frames = frames
+
+
     def set_wave_pos(self,wave_pos):
         """
         wave_pos integer part of specifies which wave from 0-num_waves,
@@ -209,29 +627,188 @@ class Wavetable:
         wave_pos = min(max(wave_pos, 0), self.num_waves-1)  # constrain
         self.wave_pos = wave_pos
 
+        if self.morph_frames is not None:  # use precomputed mix if in range
+            idx = int((wave_pos - self.morph_pos_min) * self.morph_steps + 0.5)
+            if 0 <= idx < len(self.morph_frames):
+                if idx != self.morph_idx:
+                    self.morph_idx = idx
+                    self.waveform[:] = self.morph_frames[idx]
+                    self._mix_frac = -1  # waveform no longer holds the live mix
+                return
+            self.morph_idx = -1
+
         samp_posA = int(wave_pos) * self.size
-        samp_posB = int(wave_pos+1) * self.size
+        samp_posB = min(int(wave_pos+1), int(self.num_waves)-1) * self.size
         #print("samp_posA", samp_posA, self.samp_posA, wave_pos)
         if samp_posA != self.samp_posA:  # avoid needless computation
-            if self.wav:  # if we've loaded the entire wavetable into RAM
+            if self.samp_posA >= 0:
+                self._direction = 1 if samp_posA > self.samp_posA else -1
+            self.samp_posA = samp_posA  # save
+            if self.wav is not None:  # if we've loaded the entire wavetable into RAM
                 waveformA = self.wav[samp_posA : samp_posA + self.size] # slice
                 waveformB = self.wav[samp_posB : samp_posB + self.size]
+            elif self.packed is not None:  # compressed in RAM
+                waveformA = self._unpack_wave(samp_posA // self.size, self._unpackedA)
+                waveformB = self._unpack_wave(samp_posB // self.size, self._unpackedB)
             else:
-                self.w.setpos(samp_posA)
-                waveformA = np.frombuffer(self.w.readframes(self.size), dtype=np.int16)
-                self.w.setpos(samp_posB)
-                waveformB = np.frombuffer(self.w.readframes(self.size), dtype=np.int16)
+                waveformA = self._read_wave(samp_posA // self.size)
+                waveformB = self._read_wave(samp_posB // self.size)
 
-            self.samp_posA = samp_posA  # save
             self.waveformA = waveformA
             self.waveformB = waveformB
+            if self.inplace_mix:
+                self._load_mix_frames()
 
         # fractional position between a wave A & B
         wave_pos_frac = wave_pos - int(wave_pos)
+        if self.inplace_mix:
+            self._mix_inplace(wave_pos_frac)
+            return
         # mix waveforms A & B and copy result into waveform used by synthio
         # and reduce volume of wavetable by 2 so multi-voice doesn't distort as much
         self.waveform[:] = lerp(self.waveformA, self.waveformB, wave_pos_frac) // 2
 
+    def mix_into(self, out, wave_pos):
+        """
+        Mix the waveform at wave_pos into out, like set_wave_pos() does into
+        `waveform` but leaving this wavetable's own position alone, so voices
+        can each have their own wave position. Mixes without allocating,
+        after the first call.
+        """
+        wave_pos = min(max(wave_pos, 0), self.num_waves-1)  # constrain
+        if self.morph_frames is not None:  # use precomputed mix if in range
+            idx = int((wave_pos - self.morph_pos_min) * self.morph_steps + 0.5)
+            if 0 <= idx < len(self.morph_frames):
+                out[:] = self.morph_frames[idx]
+                return
+        if self._voice_a is None:  # scratch for mix_into(), only if used
+            self._voice_a = np.zeros(self.size, dtype=np.float)
+            self._voice_b = np.zeros(self.size, dtype=np.float)
+            if self.packed is not None:
+                self._voice_unpacked = np.zeros(self.size, dtype=np.int16)
+        wave_idx = int(wave_pos)
+        a, b = self._voice_a, self._voice_b
+        a[:] = self._wave_at(wave_idx)
+        b[:] = self._wave_at(min(wave_idx+1, int(self.num_waves)-1))
+        # out = (a + (b-a) * frac) / 2, frac quantized like _mix_inplace()
+        b -= a
+        b *= int((wave_pos - wave_idx) * 256) / 256
+        b += a
+        b *= 0.5
+        out[:] = b
+
+    def _wave_at(self, wave_idx):
+        """Get a single wave for mix_into(), from wherever this table keeps them"""
+        if self.wav is not None:
+            return self.wav[wave_idx * self.size : (wave_idx+1) * self.size]
+        if self.packed is not None:
+            return self._unpack_wave(wave_idx, self._voice_unpacked)
+        return self._read_wave(wave_idx)
+
+    def _open(self):
+        """Open the WAV file, if not already open"""
+        if self.w is None:
+            self.w = adafruit_wave.open(self.filepath)
+            if self.w.getsampwidth() != 2 or self.w.getnchannels() != 1:
+                raise ValueError("unsupported WAV format")
+
+    def _unpack_wave(self, wave_idx, out):
+        """Decode a single wave of the compressed in-RAM table into out"""
+        wb = self.bank.wave_bytes(self.bank_name)
+        data = memoryview(self.packed)[wave_idx * wb : (wave_idx+1) * wb]
+        return decode_wave_into(out, data, self.bank.table_codec(self.bank_name))
+
+    def _load_wave(self, wave_idx):
+        """Get a single wave from the cache, or from the WAV file if not cached.
+        Returns (wave, True) if the file had to be read"""
+        wave = wave_cache.get(self.filepath, wave_idx)
+        if wave is not None:
+            return wave, False
+        if self.bank:
+            wave = np.zeros(self.size, dtype=np.int16)
+            self.bank.read_wave_into(wave, self.bank_name, wave_idx)
+        else:
+            self._open()
+            self.w.setpos(wave_idx * self.size)
+            wave = np.frombuffer(self.w.readframes(self.size), dtype=np.int16)
+        wave_cache.put(self.filepath, wave_idx, wave)
+        return wave, True
+
+    def _ring_put(self, wave_idx, wave):
+        """
+        Add a wave to the ring, dropping the one furthest outside its window:
+        one wave behind the current wave and ring_size-2 ahead of it,
+        in the direction the wave position is moving
+        """
+        self._ring[wave_idx] = wave
+        if len(self._ring) > self.ring_size:
+            pos = self.samp_posA // self.size
+            direction = self._direction
+            ahead = self.ring_size - 2
+            def outside(i):
+                rel = (i - pos) * direction
+                return -1 - rel if rel < -1 else rel - ahead
+            del self._ring[max(self._ring, key=outside)]
+
+    def _read_wave(self, wave_idx):
+        """Get a single wave for set_wave_pos(), preferring the prefetch ring"""
+        wave = self._ring.get(wave_idx)
+        if wave is not None:
+            self.prefetch_hits += 1
+            return wave
+        wave, did_read = self._load_wave(wave_idx)
+        if did_read:
+            self.stalls += 1
+        if self.ring_size:
+            self._ring_put(wave_idx, wave)
+        return wave
+
+    def prefetch(self):
+        """
+        Load one wave ahead of the current wave position into the ring,
+        in the direction the wave position is moving. Call this regularly
+        (e.g. every Instrument update) so a scanning wave position finds its
+        next waves already loaded. Returns True if a wave was loaded.
+        """
+        if self.wav is not None or self.packed is not None or not self.ring_size:
+            return False
+        pos = self.samp_posA // self.size
+        for i in range(1, self.ring_size - 1):  # the ring's window ahead
+            wave_idx = pos + self._direction * i
+            if wave_idx < 0 or wave_idx >= self.num_waves:
+                break
+            if wave_idx not in self._ring:
+                self._ring_put(wave_idx, self._load_wave(wave_idx)[0])
+                return True
+        return False
+
+    def _load_mix_frames(self):
+        """Precompute halved wave A and A->B delta for the in-place mixer"""
+        self._half_a[:] = self.waveformA
+        self._half_a *= 0.5
+        self._delta[:] = self.waveformB
+        self._delta *= 0.5
+        self._delta -= self._half_a
+        self._mix_frac = -1  # force a remix on new frames
+
+    def _mix_inplace(self, wave_pos_frac):
+        """
+        Crossfade waves A & B straight into self.waveform without allocating.
+        The mix fraction is quantized to 1/256 steps, so an LFO that has
+        not moved far enough to change the output does no work at all.
+        """
+        frac = int(wave_pos_frac * 256)
+        if frac == self._mix_frac:
+            return
+        self._mix_frac = frac
+        mix = self._mix
+        mix[:] = self._delta
+        mix *= frac / 256
+        mix += self._half_a
+        self.waveform[:] = mix
+
     def deinit(self):
-        """Close the WAV file used by this wavetable"""
-        self.w.close()
+        """Close the WAV file used by this wavetable (a WaveBank stays open)"""
+        if self.w:
+            self.w.close()
+            self.w = None
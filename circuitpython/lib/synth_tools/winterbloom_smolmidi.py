@@ -69,11 +69,13 @@ def _is_channel_message(status_byte):
     return status_byte >= NOTE_OFF and status_byte <= PITCH_BEND + 0x0F
 
 
-def _read_n_bytes(port, buf, dest, num_bytes):
-    while num_bytes:
-        if port.readinto(buf):
-            dest.append(buf[0])
-            num_bytes -= 1
+def _data_length(message_type):
+    if message_type in _LEN_2_MESSAGES:
+        return 2
+    if message_type in _LEN_1_MESSAGES:
+        return 1
+    return 0
+
 
 class Message:
     def __init__(self):
@@ -90,84 +92,193 @@ class Message:
 
 
 class MidiIn:
-    def __init__(self, port, enable_running_status=False):
+    """Reads MIDI messages from a port.
+
+    Each receive() drains whatever the port has into a preallocated
+    buffer with a single readinto and decodes it a byte at a time with a
+    small state machine, so messages may span reads. Messages come from a
+    ring of `num_messages` reused Message objects, so a Message (and its
+    data) is only valid until `num_messages - 1` more have been received.
+    Real-time messages are delivered even when they arrive in the middle
+    of another message.
+
+    If `sysex_buffer` (a bytearray) and `on_sysex` are given, sysex
+    messages are not returned by receive(). Their data bytes are instead
+    gathered into sysex_buffer as they arrive, across receive() calls,
+    and `on_sysex(data, complete)` is called with a memoryview of them:
+    with complete False each time the buffer fills, and with complete
+    True at the end of the message. The data is only valid during the
+    call. Each receive() call reads at most one buffer of sysex bytes,
+    so a large dump never holds up the caller.
+    """
+
+    def __init__(self, port, enable_running_status=False, buffer_size=64, num_messages=4,
+                 sysex_buffer=None, on_sysex=None):
         self._port = port
-        self._read_buf = bytearray(1)
+        self._buf = bytearray(buffer_size)
+        self._pos = 0  # next byte of _buf to decode
+        self._end = 0  # end of the bytes read into _buf
         self._running_status_enabled = enable_running_status
         self._running_status = None
         self._outstanding_sysex = False
+        self._skipping_sysex = False
         self._error_count = 0
+        # message being decoded
+        self._status = 0
+        self._data = bytearray(2)
+        self._num_data = 0
+        self._data_needed = 0
+        # reused messages, each with its own data buffers
+        self._messages = [Message() for _ in range(num_messages)]
+        self._message_data = [(bytearray(1), bytearray(2)) for _ in range(num_messages)]
+        self._next_message = 0
+        # streaming sysex
+        self._on_sysex = on_sysex
+        self._sysex_buf = sysex_buffer
+        self._sysex_view = memoryview(sysex_buffer) if sysex_buffer else None
+        self._sysex_len = None  # bytes in _sysex_buf, None when not in a sysex
 
     @property
     def error_count(self):
         return self._error_count
 
-    def receive(self):
-        # Before we do anything, check and see if there's an unprocessed
-        # sysex message pending. If so, throw it away. The caller has
-        # to call receive_sysex if they care about the bytes.
-        if self._outstanding_sysex:
-            self.receive_sysex(0)
-
-        # Read the status byte for the next message.
-        result = self._port.readinto(self._read_buf)
-
-        # No message ready.
-        if not result:
-            return None
-
-        message = Message()
-        data_bytes = bytearray()
-
-        # Is this a status byte?
-        status_byte = self._read_buf[0]
-        is_status = status_byte & 0x80
-
-        # If not, see if we have a running status byte.
-        if not is_status:
-            if self._running_status_enabled and self._running_status:
-                data_bytes = [status_byte]
-                status_byte = self._running_status
-            # If not a status byte and no running status, this is
-            # invalid data.
-            else:
-                self._error_count += 1
-                return None
-
-        # Is this a channel message, if so, let's figure out the right
-        # message type and set the message's channel property.
+    def _fill(self):
+        """Read all the port has into the buffer, returns False if nothing"""
+        self._pos = 0
+        self._end = self._port.readinto(self._buf) or 0
+        return self._end > 0
+
+    def _emit(self, status_byte, num_data):
+        """Fill the next reused message from a status byte and decoded data"""
+        i = self._next_message
+        self._next_message = (i + 1) % len(self._messages)
+        message = self._messages[i]
         if _is_channel_message(status_byte):
-            # Only set the running status byte for channel messages.
-            self._running_status = status_byte
-            # Mask off the channel nibble.
             message.type = status_byte & 0xF0
             message.channel = status_byte & 0x0F
         else:
             message.type = status_byte
+            message.channel = None
+        if num_data:
+            data = self._message_data[i][num_data - 1]
+            data[0] = self._data[0]
+            if num_data == 2:
+                data[1] = self._data[1]
+            message.data = data
+        else:
+            message.data = None
+        return message
 
-        # Read the appropriate number of bytes for each message type.
-        if message.type in _LEN_2_MESSAGES:
-            _read_n_bytes(self._port, self._read_buf, data_bytes, 2 - len(data_bytes))
-            message.data = data_bytes
-        elif message.type in _LEN_1_MESSAGES:
-            _read_n_bytes(self._port, self._read_buf, data_bytes, 1 - len(data_bytes))
-            message.data = data_bytes
-
-        # If this is a sysex message, set the pending sysex flag so we
-        # can throw the message away if the user doesn't process it.
-        if message.type == SYSEX:
-            self._outstanding_sysex = True
-
-        # Check the data bytes for corruption. If the data bytes have any status bytes
-        # embedded, it probably means the buffer overflowed. Either way, discard the
-        # message.
-        # TODO: Figure out a better way to detect and deal with this upstream.
-        for b in data_bytes:
-            if b & 0x80:
-                self._error_count += 1
-                return None
+    def _end_sysex(self):
+        """Deliver the rest of a streamed sysex message"""
+        num_bytes = self._sysex_len
+        self._sysex_len = None
+        self._on_sysex(self._sysex_view[:num_bytes], True)
 
-        return message
+    def receive(self):
+        # Before we do anything, check and see if there's an unprocessed
+        # sysex message pending. If so, throw it away as it arrives. The
+        # caller has to call receive_sysex if they care about the bytes.
+        if self._outstanding_sysex:
+            self._outstanding_sysex = False
+            self._skipping_sysex = True
+
+        buf = self._buf
+        filled = False
+        while True:
+            if self._pos == self._end:
+                # At most one buffer of streamed sysex per call.
+                if filled and self._sysex_len is not None:
+                    return None
+                if not self._fill():
+                    return None  # No message ready.
+                filled = True
+            pos, end = self._pos, self._end
+            while pos < end:
+                byte = buf[pos]
+                pos += 1
+
+                # Real-time messages can come at any time, even mid-message.
+                if byte >= CLOCK:
+                    self._pos = pos
+                    return self._emit(byte, 0)
+
+                if self._sysex_len is not None:
+                    if not byte & 0x80:
+                        self._sysex_buf[self._sysex_len] = byte
+                        self._sysex_len += 1
+                        if self._sysex_len == len(self._sysex_buf):
+                            self._sysex_len = 0
+                            self._on_sysex(self._sysex_view, False)
+                        continue
+                    # any status byte ends a sysex message
+                    self._end_sysex()
+                    if byte == SYSEX_END:
+                        continue
+
+                if self._skipping_sysex:
+                    if not byte & 0x80:
+                        continue
+                    self._skipping_sysex = False
+                    if byte == SYSEX_END:
+                        continue
+                    # any other status byte also ends a sysex message
+
+                # A status byte starts a new message.
+                if byte & 0x80:
+                    # A status byte in the middle of the data bytes probably
+                    # means the buffer overflowed, discard that message.
+                    if self._data_needed:
+                        self._error_count += 1
+                        self._data_needed = 0
+                    if _is_channel_message(byte):
+                        # Only set the running status byte for channel messages.
+                        self._running_status = byte
+                        num_data = _data_length(byte & 0xF0)
+                    else:
+                        num_data = _data_length(byte)
+                    if byte == SYSEX and self._on_sysex:
+                        self._sysex_len = 0  # stream it to on_sysex
+                        continue
+                    if num_data == 0:
+                        # If this is a sysex message, set the pending sysex flag
+                        # so we can throw the message away if the user doesn't
+                        # process it.
+                        if byte == SYSEX:
+                            self._outstanding_sysex = True
+                        self._pos = pos
+                        return self._emit(byte, 0)
+                    self._status = byte
+                    self._num_data = 0
+                    self._data_needed = num_data
+                    continue
+
+                # A data byte, for the message being decoded or, if there is
+                # a running status byte, for a new message with that status.
+                if not self._data_needed:
+                    if self._running_status_enabled and self._running_status:
+                        self._status = self._running_status
+                        self._num_data = 0
+                        self._data_needed = _data_length(self._status & 0xF0)
+                    # If no running status, this is invalid data.
+                    else:
+                        self._error_count += 1
+                        continue
+                self._data[self._num_data] = byte
+                self._num_data += 1
+                if self._num_data == self._data_needed:
+                    self._data_needed = 0
+                    self._pos = pos
+                    return self._emit(self._status, self._num_data)
+            self._pos = pos
+
+    def _read_byte(self):
+        """Read one byte, from the buffer if there are any, else from the port"""
+        while self._pos == self._end:
+            self._fill()
+        byte = self._buf[self._pos]
+        self._pos += 1
+        return byte
 
     def receive_sysex(self, max_length):
         """Receives the next outstanding sysex message.
@@ -183,18 +294,16 @@ class MidiIn:
 
         out = bytearray()
         length = 0
-        buf = bytearray(1)
         truncated = False
+        byte = 0
 
-        # This reads one byte at a time so we don't read past the
-        # end byte. There may be more efficient ways to do this
-        # but sysex messages should be relatively rare in practice,
-        # so I'm not sure how much benefit we'll get.
+        # The bytes come from the receive buffer first, so this never
+        # reads past the end byte.
         while length < max_length:
-            self._port.readinto(buf)
-            if buf[0] == SYSEX_END:
+            byte = self._read_byte()
+            if byte == SYSEX_END:
                 break
-            out.extend(buf)
+            out.append(byte)
             length += 1
 
         # We exceeded the length.
@@ -202,7 +311,7 @@ class MidiIn:
             truncated = True
             # Ignore the rest of the message by reading and throwing away
             # bytes until we get to SYSEX_END.
-            while buf[0] != SYSEX_END:
-                self._port.readinto(buf)
+            while byte != SYSEX_END:
+                byte = self._read_byte()
 
         return out, truncated
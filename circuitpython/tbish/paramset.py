@@ -71,6 +71,7 @@ class ParamSet:
     def __init__(self, params, num_knobs, min_knob_change=0.05,
                  knob_smooth=0.5, knob_mode = KNOB_PICKUP):
         self.params = params
+        self.changed = set()  # indices of params changed since last applied
         self.knob_mode = knob_mode
         self.nparams = len(params)
         self.nknobs = num_knobs
@@ -105,12 +106,14 @@ class ParamSet:
     def update_knobs_pickup(self, new_knob_vals):
         """new_knob_vals is list of new knob vals, each 0.0-1.0"""
         for i in range(self.nknobs):
-            param = self.params[ (self._idx * self.nknobs) + i ]
+            pi = (self._idx * self.nknobs) + i
+            param = self.params[pi]
             new_val = param.knob_to_val(new_knob_vals[i])
             if self.is_tracking[i]:
                 # only change param val if difference is big enough FIXME
                 if abs(new_val - param.val) >= 0.1 * self.min_change * param.span:
                     param.val = new_val
+                    self.changed.add(pi)
             else:
                 delta = param.val - new_val
                 if abs(delta) < self.min_change * param.span:
@@ -120,7 +123,8 @@ class ParamSet:
         """new_knob_val is list of new knob vals, each normalized 0.0-1.0"""
         # note this sucks currently
         for i in range(self.nknobs):
-            param = self.params[ (self._idx * self.nknobs) + i ]
+            pi = (self._idx * self.nknobs) + i
+            param = self.params[pi]
             new_val = param.knob_to_val(new_knob_vals[i])
             delta_val = new_val - param.val
             
@@ -139,18 +143,27 @@ class ParamSet:
             else:
                 val_percent_change = 0
 
-            param.val = min(max(param.val + val_percent_change, val_min), val_max)
+            new_val = min(max(param.val + val_percent_change, val_min), val_max)
+            if new_val != param.val:
+                param.val = new_val
+                self.changed.add(pi)
             
 
     def apply_params(self, obj):
         """ Apply all params to given object """
         for i in range(self.nparams):
             self.params[i].apply_to_obj(obj)
-            
+        self.changed.clear()
+
     def apply_knobset(self, obj):
-        """ Apply all vals in a knobset to given object """
+        """ Apply vals in a knobset to given object, only those that changed """
+        if not self.changed:
+            return
         for i in range(self.nknobs):
-            self.params[ (self._idx * self.nknobs) + i].apply_to_obj(obj)
+            pi = (self._idx * self.nknobs) + i
+            if pi in self.changed:
+                self.params[pi].apply_to_obj(obj)
+                self.changed.discard(pi)
 
     def param_for_name(self, name):
         for p in filter(lambda p: p.name == name, self.params):
@@ -0,0 +1,166 @@
+# SPDX-FileCopyrightText: Copyright (c) 2024 Tod Kurt
+# SPDX-License-Identifier: MIT
+"""
+`bench_midi.py`
+================================================================================
+
+Host-side (desktop Python) benchmark of MIDI input throughput of
+`winterbloom_smolmidi.MidiIn`, which decodes each bulk readinto() of the
+port from a buffer into reused Messages, against the parser it replaced
+(one 1-byte readinto() per byte and a new Message and bytearray per
+message). Both parse the same seeded stream, mostly CCs like a knob
+sweep with note ons, clocks, program changes and short sysex, after
+checking they give the same messages at several port read sizes.
+
+Usage:
+    pip3 install numpy
+    python3 bench_midi.py [messages]
+
+"""
+
+import random
+import sys
+import time
+
+import host_shims  # pylint: disable=unused-import
+from synth_tools import winterbloom_smolmidi as smolmidi
+from synth_tools.winterbloom_smolmidi import SYSEX, SYSEX_END
+
+CHUNK_SIZES = (1, 3, 7, 64, 1000)  # bytes the port gives per readinto()
+
+class Port:
+    """A port that gives up to chunk bytes of data per readinto()"""
+    def __init__(self, data, chunk=1000):
+        self.data = data
+        self.pos = 0
+        self.chunk = chunk
+
+    def readinto(self, buf):
+        """Copy the next bytes into buf, returns how many"""
+        n = min(len(buf), len(self.data) - self.pos, self.chunk)
+        buf[:n] = self.data[self.pos:self.pos + n]
+        self.pos += n
+        return n
+
+_LEN_1_MESSAGES = set([smolmidi.PROGRAM_CHANGE, smolmidi.CHANNEL_PRESSURE,
+                       smolmidi.SONG_SELECT, smolmidi.BUS_SELECT])
+_LEN_2_MESSAGES = set([smolmidi.NOTE_OFF, smolmidi.NOTE_ON, smolmidi.AFTERTOUCH,
+                       smolmidi.CC, smolmidi.PITCH_BEND, smolmidi.SONG_POSITION])
+
+def _read_n_bytes(port, buf, dest, num_bytes):
+    while num_bytes:
+        if port.readinto(buf):
+            dest.append(buf[0])
+            num_bytes -= 1
+
+class ByteMidiIn:
+    """MidiIn as it was, reading the port a byte at a time"""
+    def __init__(self, port, enable_running_status=False):
+        self._port = port
+        self._read_buf = bytearray(1)
+        self._running_status_enabled = enable_running_status
+        self._running_status = None
+        self._outstanding_sysex = False
+        self.error_count = 0
+
+    def receive(self):
+        """Read and return the next message, or None"""
+        if self._outstanding_sysex:
+            self.receive_sysex(0)
+        if not self._port.readinto(self._read_buf):
+            return None
+        message = smolmidi.Message()
+        data_bytes = bytearray()
+        status_byte = self._read_buf[0]
+        if not status_byte & 0x80:
+            if self._running_status_enabled and self._running_status:
+                data_bytes = [status_byte]
+                status_byte = self._running_status
+            else:
+                self.error_count += 1
+                return None
+        if smolmidi._is_channel_message(status_byte):  # pylint: disable=protected-access
+            self._running_status = status_byte
+            message.type = status_byte & 0xF0
+            message.channel = status_byte & 0x0F
+        else:
+            message.type = status_byte
+        if message.type in _LEN_2_MESSAGES:
+            _read_n_bytes(self._port, self._read_buf, data_bytes, 2 - len(data_bytes))
+            message.data = data_bytes
+        elif message.type in _LEN_1_MESSAGES:
+            _read_n_bytes(self._port, self._read_buf, data_bytes, 1 - len(data_bytes))
+            message.data = data_bytes
+        if message.type == SYSEX:
+            self._outstanding_sysex = True
+        for b in data_bytes:
+            if b & 0x80:
+                self.error_count += 1
+                return None
+        return message
+
+    def receive_sysex(self, max_length):
+        """Read the outstanding sysex message, returns (data, truncated)"""
+        self._outstanding_sysex = False
+        out = bytearray()
+        length = 0
+        buf = bytearray(1)
+        truncated = False
+        while length < max_length:
+            self._port.readinto(buf)
+            if buf[0] == SYSEX_END:
+                break
+            out.extend(buf)
+            length += 1
+        else:
+            truncated = True
+            while buf[0] != SYSEX_END:
+                self._port.readinto(buf)
+        return out, truncated
+
+def make_stream(messages, seed=1):
+    """A stream of mostly CCs, with note ons, clocks, sysex and program changes"""
+    rand = random.Random(seed)
+    stream = bytearray()
+    for k in range(messages):
+        r = rand.random()
+        if r < 0.6:
+            stream += bytes([smolmidi.CC | k % 16, k % 128, (k * 7) % 128])
+        elif r < 0.8:
+            stream += bytes([smolmidi.NOTE_ON, k % 128, 100])
+        elif r < 0.85:
+            stream += bytes([smolmidi.CLOCK])
+        elif r < 0.87:
+            stream += bytes([SYSEX, 1, 2, 3, SYSEX_END])
+        else:
+            stream += bytes([smolmidi.PROGRAM_CHANGE | 3, 5])
+    return stream
+
+def parse(midi_in):
+    """Receive all messages, copying their data as the new MidiIn reuses it"""
+    out = []
+    while True:
+        msg = midi_in.receive()
+        if msg is None:
+            return out
+        out.append((msg.type, msg.channel, bytes(msg.data) if msg.data else None))
+
+def main(messages=20000):
+    """Run the MIDI throughput benchmarks"""
+    stream = make_stream(messages)
+    expected = parse(ByteMidiIn(Port(stream)))
+    for chunk in CHUNK_SIZES:
+        assert parse(smolmidi.MidiIn(Port(stream, chunk))) == expected, chunk
+
+    print(len(expected), "messages,", len(stream), "bytes")
+    print("%-16s %12s %12s" % ("", "msgs/s", "bytes/s"))
+    for name, make in (("byte at a time", lambda: ByteMidiIn(Port(stream))),
+                       ("buffered", lambda: smolmidi.MidiIn(Port(stream)))):
+        midi_in = make()
+        t = time.perf_counter()
+        parse(midi_in)
+        dt = time.perf_counter() - t
+        print("%-16s %12.0f %12.0f" % (name, len(expected) / dt, len(stream) / dt))
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:2]])
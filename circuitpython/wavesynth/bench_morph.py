@@ -0,0 +1,91 @@
+# SPDX-FileCopyrightText: Copyright (c) 2024 Tod Kurt
+# SPDX-License-Identifier: MIT
+"""
+`bench_morph.py`
+================================================================================
+
+Host-side (desktop Python) benchmark of the per-tick cost of a patch morph
+on a `PolyWaveSynth` with 4 notes held: `set_morph()`, which writes the
+packed values straight into the synthio objects, against a Python lerp of
+each morphing setting with `Patch.set()` and the instrument applying the
+changes by name, as a knob edit is applied. Each is timed alone and
+followed by the `update()` the control loop runs every tick anyway.
+
+Usage:
+    pip3 install numpy
+    python3 bench_morph.py [ticks]
+
+"""
+
+import sys
+import time
+import tracemalloc
+
+import host_shims  # pylint: disable=unused-import
+import synthio
+from synth_tools.patch import Patch
+from synth_tools.patch_morph import morph_fields, _get_setting
+from synth_tools.patch_saver import copy
+from synth_tools.instrument import PolyWaveSynth
+
+def make_pair():
+    """Two patches that differ in every morph field"""
+    a = Patch('a', filt_f=500, filt_q=0.7)
+    b = Patch('b', filt_f=6000, filt_q=2.0)
+    b.wave_mix, b.wave_mix_lfo_amount, b.wave_mix_lfo_rate = 0.9, 3, 2
+    b.detune, b.filt_env_amount = 1.03, 0.8
+    for env in (b.filt_env, b.amp_env):
+        env.attack_time, env.decay_time, env.release_time = 1.5, 0.7, 2.0
+    return a, b
+
+def bench(label, tick, ticks):
+    """Time ticks calls of tick(amount), then trace their allocations
+    in a second run, as tracing slows allocating code down"""
+    tick(0.5)  # warm up
+    t = time.perf_counter()
+    for i in range(ticks):
+        tick(i / ticks)
+    dt = time.perf_counter() - t
+    tracemalloc.start()
+    for i in range(ticks):
+        tick(1 - i / ticks)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print("%-28s %7.1f us/tick, peak traced %6d bytes" % (label, dt / ticks * 1e6, peak))
+
+def main(ticks=2000):
+    """Run the morph benchmarks"""
+    a, b = make_pair()
+    by_name = PolyWaveSynth(synthio.Synthesizer(), copy(a))
+    morphing = PolyWaveSynth(synthio.Synthesizer(), copy(a))
+    for inst in (by_name, morphing):
+        for note in (48, 52, 55, 60):
+            inst.note_on(note)
+
+    # per-attribute lerp, the way a morph would be done without PatchMorph
+    played = by_name.played
+    def lerp_tick(amount):
+        for name in morph_fields:
+            start, end = _get_setting(a, name), _get_setting(b, name)
+            played.set(name, start + (end - start) * amount)
+        changes = played.pop_changes()
+        if changes:
+            by_name._apply_changes(changes)  # pylint: disable=protected-access
+    def lerp_update_tick(amount):
+        lerp_tick(amount)
+        by_name.update()
+    bench("per-attribute lerp", lerp_tick, ticks)
+    bench("per-attribute lerp + update", lerp_update_tick, ticks)
+
+    morphing.morph_to(b)
+    def morph_update_tick(amount):
+        morphing.set_morph(amount)
+        morphing.update()
+    bench("set_morph", morphing.set_morph, ticks)
+    bench("set_morph + update", morph_update_tick, ticks)
+    morph = morphing.morph
+    print(len(morph.fields), "of", len(morph_fields), "morph fields differ,",
+          len(morph._dests), "destinations")  # pylint: disable=protected-access
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:2]])
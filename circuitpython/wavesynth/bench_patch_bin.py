@@ -0,0 +1,98 @@
+# SPDX-FileCopyrightText: Copyright (c) 2024 Tod Kurt
+# SPDX-License-Identifier: MIT
+"""
+`bench_patch_bin.py`
+================================================================================
+
+Host-side (desktop Python) benchmark of loading a bank of patches from
+the JSON patch file (`load_patches()`, which reads and parses the whole
+file at once) against the binary patch file (`read_patches_bin()`, a
+record at a time) and the patch journal (`PatchJournal.load()`), and of
+just indexing the journal like `PatchBank` does at boot
+(`PatchJournal.scan()`). Reports load time and peak traced RAM.
+
+The patches are made up, with varied settings, and written to a
+temporary directory in each format. Most of the binary loads' peak is
+the Patches themselves. Desktop Python parses JSON in C, so the load
+times here favour JSON more than they do on a microcontroller.
+
+Usage:
+    pip3 install numpy
+    python3 bench_patch_bin.py [num_patches]
+
+"""
+
+import contextlib
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import host_shims  # pylint: disable=unused-import
+from synth_tools.patch import Patch, WaveType
+from synth_tools.patch_saver import (to_dict, load_patches, save_patches, read_patches_bin,
+                                     save_patches_bin, PatchJournal)
+import synth_tools.patch_saver
+
+def make_patches(num_patches, seed=1):
+    """Patches with random settings"""
+    rand = random.Random(seed)
+    patches = []
+    for i in range(num_patches):
+        patch = Patch('patch%d' % i, wave_type=rand.choice((WaveType.OSC, WaveType.SSAW)),
+                      wave=rand.choice(('SAW', 'SQU', 'SIN', 'TRI')),
+                      detune=1 + rand.random() * 0.05, filt_f=rand.uniform(60, 8000),
+                      filt_q=rand.uniform(0.1, 2.5))
+        patch.wave_mix = rand.random()
+        patch.filt_env.attack_time = rand.uniform(0.01, 3)
+        patch.amp_env.release_time = rand.uniform(0.01, 3)
+        patches.append(patch)
+    return patches
+
+def bench(load, rounds=10):
+    """Time load(), then trace its peak RAM, returns (ms, peak bytes, result)"""
+    t = time.perf_counter()
+    for _ in range(rounds):
+        result = load()
+    dt = (time.perf_counter() - t) / rounds
+    tracemalloc.start()
+    load()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return dt * 1000, peak, result
+
+def main(num_patches=128):
+    """Run the patch loading benchmarks"""
+    patches = make_patches(num_patches)
+    tmpdir = tempfile.mkdtemp()
+    json_fname = os.path.join(tmpdir, 'saved_patches.json')
+    bin_fname = os.path.join(tmpdir, 'saved_patches.bin')
+    journal_fname = os.path.join(tmpdir, 'saved_patches.jnl')
+    with contextlib.redirect_stdout(io.StringIO()):
+        synth_tools.patch_saver.last_write_time = -100  # no wait between writes
+        save_patches(patches, json_fname)
+        synth_tools.patch_saver.last_write_time = -100
+        save_patches_bin(patches, bin_fname)
+        PatchJournal(journal_fname).save(patches)
+
+    expected = [to_dict(p) for p in patches]
+    journal = PatchJournal(journal_fname)
+    print("%d patches, file sizes: json %d, bin %d, journal %d bytes" % (
+        num_patches, os.stat(json_fname)[6], os.stat(bin_fname)[6], os.stat(journal_fname)[6]))
+    print("%-22s %10s %16s" % ("", "load ms", "peak traced bytes"))
+    for name, load in (("json load_patches", lambda: load_patches(json_fname)),
+                       ("bin read_patches_bin", lambda: list(read_patches_bin(bin_fname))),
+                       ("journal load", journal.load),
+                       ("journal scan only", journal.scan)):
+        with contextlib.redirect_stdout(io.StringIO()):  # loading chatter
+            ms, peak, result = bench(load)
+        if isinstance(result, list):  # floats go through float32 in the binary files
+            assert all(abs(p.filt_f - d['filt_f']) < 0.01 and p.name == d['name']
+                       for p, d in zip(result, expected)), name
+        print("%-22s %10.2f %16d" % (name, ms, peak))
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:2]])
@@ -0,0 +1,93 @@
+# SPDX-FileCopyrightText: Copyright (c) 2024 Tod Kurt
+# SPDX-License-Identifier: MIT
+"""
+`bench_patch_saver.py`
+================================================================================
+
+Host-side (desktop Python) microbenchmark of the `patch_saver`
+serializers, which use a field list found once per class by `_schema()`,
+against the reflection-based ones they replaced (`dir()` of every object
+and `isinstance()` checks on every value, each time). Runs to_dict(),
+from_dict() and copy() over the patches in `saved_patches.json`, after
+checking both give the same results.
+
+Usage:
+    pip3 install numpy
+    python3 bench_patch_saver.py [rounds] [saved_patches.json]
+
+"""
+
+import json
+import os
+import sys
+import time
+
+import host_shims
+from synth_tools import patch_saver
+from synth_tools.patch import Patch
+
+PATCHES_FILE = os.path.join(host_shims.HOST_DIR, 'saved_patches.json')
+
+def reflect_to_dict(obj):
+    """to_dict() as it was, finding an object's props with dir() each time"""
+    props = set(dir(obj)) - set(dir(obj.__class__))
+    d = {}
+    for p in props:
+        if p.startswith('_'):
+            continue
+        d[p] = getattr(obj, p)
+        if d[p] is None:
+            pass
+        elif not isinstance(d[p], (float, int, str)):
+            d[p] = reflect_to_dict(d[p])
+    return d
+
+def reflect_from_dict(d, cls):
+    """from_dict() as it was, checking each default attribute's type"""
+    obj = cls()
+    for propname in d:
+        attr = getattr(obj, propname)
+        if attr is None:
+            pass
+        elif isinstance(attr, (float, int, str)):
+            setattr(obj, propname, d[propname])
+        else:
+            setattr(obj, propname, reflect_from_dict(d[propname], attr.__class__))
+    return obj
+
+def reflect_copy(obj):
+    """copy() as it was, through dict space"""
+    return reflect_from_dict(reflect_to_dict(obj), obj.__class__)
+
+def bench(func, rounds):
+    """Microseconds per call of func()"""
+    t = time.perf_counter()
+    for _ in range(rounds):
+        func()
+    return (time.perf_counter() - t) / rounds * 1e6
+
+def main(rounds=500, patches_file=PATCHES_FILE):
+    """Run the serializer benchmarks"""
+    with open(patches_file) as fp:
+        dicts = json.load(fp)
+    patches = [patch_saver.from_dict(d, Patch) for d in dicts]
+    assert [reflect_to_dict(p) for p in patches] == [patch_saver.to_dict(p) for p in patches]
+    assert ([reflect_to_dict(reflect_from_dict(d, Patch)) for d in dicts] ==
+            [patch_saver.to_dict(p) for p in patches])
+    assert ([reflect_to_dict(patch_saver.copy(p)) for p in patches] ==
+            [reflect_to_dict(p) for p in patches])
+
+    print(len(patches), "patches from", patches_file, "- us for all of them:")
+    print("%-10s %12s %12s %8s" % ("", "reflection", "schema", "speedup"))
+    for name, old, new in (
+            ("to_dict", lambda: [reflect_to_dict(p) for p in patches],
+             lambda: [patch_saver.to_dict(p) for p in patches]),
+            ("from_dict", lambda: [reflect_from_dict(d, Patch) for d in dicts],
+             lambda: [patch_saver.from_dict(d, Patch) for d in dicts]),
+            ("copy", lambda: [reflect_copy(p) for p in patches],
+             lambda: [patch_saver.copy(p) for p in patches])):
+        old_us, new_us = bench(old, rounds), bench(new, rounds)
+        print("%-10s %12.0f %12.0f %7.1fx" % (name, old_us, new_us, old_us / new_us))
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:2]], *sys.argv[2:3])
@@ -0,0 +1,58 @@
+# SPDX-FileCopyrightText: Copyright (c) 2024 Tod Kurt
+# SPDX-License-Identifier: MIT
+"""
+`bench_routes.py`
+================================================================================
+
+Host-side (desktop Python) benchmark of control-loop time with N
+modulation routes active: `PolyWaveSynth.update()` with N voices held,
+each with its filter envelope as a `ModRoute` that synthio evaluates
+itself, against computing N such routes in Python every tick
+(`dest = clamp(offset + source.value * amount)`), the way filter
+envelopes were done before `ModRoute`.
+
+Usage:
+    pip3 install numpy
+    python3 bench_routes.py [ticks]
+
+"""
+
+import sys
+import time
+
+import host_shims  # pylint: disable=unused-import
+import synthio
+from synth_tools.patch import Patch
+from synth_tools.instrument import PolyWaveSynth
+
+ROUTE_COUNTS = (1, 4, 8, 16, 32)
+
+def python_tick(routes):
+    """One control-loop tick of routes done in Python"""
+    for source, dest, amount, offset, lo, hi in routes:
+        dest.frequency = min(max(offset + source.value * amount, lo), hi)
+
+def time_ticks(tick, ticks):
+    """Microseconds per call of tick()"""
+    t = time.perf_counter()
+    for _ in range(ticks):
+        tick()
+    return (time.perf_counter() - t) / ticks * 1e6
+
+def main(ticks=5000):
+    """Run the control-loop benchmarks"""
+    print("%6s %16s %24s" % ("routes", "python us/tick", "update() w/ModRoutes us"))
+    for n in ROUTE_COUNTS:
+        py_routes = [(synthio.LFO(once=True), synthio.Biquad(synthio.FilterMode.LOW_PASS),
+                      4000, 1000, 60, 8000) for _ in range(n)]
+        py_us = time_ticks(lambda: python_tick(py_routes), ticks)
+
+        synth = synthio.Synthesizer()
+        inst = PolyWaveSynth(synth, Patch('bench'), num_voices=n)
+        for i in range(n):
+            inst.note_on(36 + i)
+        update_us = time_ticks(inst.update, ticks)
+        print("%6d %16.2f %24.2f" % (n, py_us, update_us))
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:2]])
@@ -0,0 +1,102 @@
+# SPDX-FileCopyrightText: Copyright (c) 2024 Tod Kurt
+# SPDX-License-Identifier: MIT
+"""
+`bench_supersaw.py`
+================================================================================
+
+Host-side (desktop Python) comparison of the precomputed 7-saw supersaw
+tables of `Waves.shared_supersaw()` against true unison of as many saws
+(one synthio.Note per saw), with the same detune between neighbours:
+notes per key, how many keys fit in synthio's note channels, table memory,
+and the cost of rendering the notes with a numpy stand-in for synthio's
+per-note oscillator. Also checks that the table's saws really are
+detuned, by finding the spectral peaks around the played frequency.
+
+Usage:
+    pip3 install numpy
+    python3 bench_supersaw.py
+
+"""
+
+import time
+
+import numpy
+
+import host_shims  # pylint: disable=unused-import
+from synth_tools.waves import Waves
+from synth_tools.instrument import supersaw_steps, supersaw_cycles
+
+SAMPLE_RATE = 28000
+NUM_SAWS = 7  # saws in a supersaw table, the default of Waves.supersaw()
+MAX_CHANNELS = 12  # synthio notes playing at once, CIRCUITPY_SYNTHIO_MAX_CHANNELS
+KEYS = 4
+FREQ = 220.0
+
+def render(notes, seconds=1.0):
+    """Sum (waveform, frequency) notes for seconds, with the linearly
+    interpolated table lookup synthio does per note per sample"""
+    num = int(SAMPLE_RATE * seconds)
+    out = numpy.zeros(num)
+    t = numpy.arange(num)
+    for waveform, freq in notes:
+        size = len(waveform)
+        pos = (t * (freq * size / SAMPLE_RATE)) % size
+        i = pos.astype(int)
+        frac = pos - i
+        wave = numpy.asarray(waveform, dtype=float)
+        out += wave[i] * (1 - frac) + wave[(i + 1) % size] * frac
+    return out
+
+def peaks_near(signal, freq, count):
+    """Frequencies of the strongest spectral peaks within 15% of freq"""
+    spectrum = numpy.abs(numpy.fft.rfft(signal * numpy.hanning(len(signal))))
+    freqs = numpy.fft.rfftfreq(len(signal), 1 / SAMPLE_RATE)
+    band = (freqs > freq * 0.85) & (freqs < freq * 1.15)
+    idx = numpy.flatnonzero(band)
+    local = [i for i in idx if spectrum[i] >= spectrum[i-1] and spectrum[i] >= spectrum[i+1]]
+    local.sort(key=lambda i: -spectrum[i])
+    return sorted(round(float(freqs[i]), 1) for i in local[:count])
+
+def time_render(notes):
+    """Seconds to render one second of notes"""
+    t = time.perf_counter()
+    render(notes)
+    return time.perf_counter() - t
+
+def main():
+    """Run the supersaw comparison"""
+    print("spread step, cycles, neighbour detune, outer detune, table build ms, table bytes")
+    total = 0
+    for step in range(supersaw_steps):
+        t = time.perf_counter()
+        table = Waves.shared_supersaw(step, supersaw_steps)
+        dt = time.perf_counter() - t
+        total += len(table) * 2
+        cycles = supersaw_cycles(step)
+        detune = 100 / cycles if cycles > 1 else 0
+        print("  %d  %3d  %5.2f%%  %6.2f%%  %6.2f  %5d" % (step, cycles, detune,
+                                                       detune * (NUM_SAWS // 2),
+                                                       dt * 1000, len(table) * 2))
+    print("all spread steps:", total, "bytes")
+
+    step = supersaw_steps // 2
+    table = Waves.shared_supersaw(step, supersaw_steps)
+    cycles = supersaw_cycles(step)
+    detune = 1.01
+    table_notes = [(table, FREQ / cycles), (table, FREQ * detune / cycles)]
+    saw = Waves.saw(512, 32767 // 2)
+    spread = 1 / cycles  # same detune between neighbouring saws as the table
+    unison_notes = [(saw, FREQ * (1 + (i - NUM_SAWS // 2) * spread))
+                    for i in range(NUM_SAWS)]
+    print("\nspread step %d, %.1f Hz key" % (step, FREQ))
+    print("table peaks:  ", peaks_near(render(table_notes[:1]), FREQ, NUM_SAWS))
+    print("unison peaks: ", peaks_near(render(unison_notes), FREQ, NUM_SAWS))
+
+    print("\n%-14s %9s %12s %22s" % ("", "notes/key", "keys in %d" % MAX_CHANNELS,
+                                     "render %d keys, s/s" % KEYS))
+    for name, notes in (("table", table_notes), ("true unison", unison_notes)):
+        cost = time_render(notes * KEYS)
+        print("%-14s %9d %12d %22.3f" % (name, len(notes), MAX_CHANNELS // len(notes), cost))
+
+if __name__ == "__main__":
+    main()
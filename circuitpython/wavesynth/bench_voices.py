@@ -0,0 +1,98 @@
+# SPDX-FileCopyrightText: Copyright (c) 2024 Tod Kurt
+# SPDX-License-Identifier: MIT
+"""
+`bench_voices.py`
+================================================================================
+
+Host-side (desktop Python) benchmark of note_on/note_off throughput of
+`PolyWaveSynth` with its voice pool, against making new synthio objects
+for every note (an Envelope, LFO, Biquad and two Notes, as PolyWaveSynth
+did before the pool). Also counts the synthio objects made while playing,
+which on a microcontroller are what fill the heap and cause GC pauses.
+On the host, making the fake synthio objects is cheap, so the pool's
+extra bookkeeping can make it slower here than it is on a device.
+
+The playing is a fast arpeggio holding `held` notes at a time,
+with update() called every few events like the main loop does.
+
+Usage:
+    pip3 install numpy
+    python3 bench_voices.py [events] [held]
+
+"""
+
+import sys
+import time
+
+import host_shims
+import synthio
+from synth_tools.patch import Patch
+from synth_tools.instrument import PolyWaveSynth, lfo_exp_wave
+
+class AllocatingVoices:
+    """note_on/note_off that make new synthio objects for every note"""
+    def __init__(self, synth, patch, waveform):
+        self.synth = synth
+        self.patch = patch
+        self.waveform = waveform
+        self.voices = {}
+
+    def note_on(self, midi_note, midi_vel=127):
+        """Make and press a new voice"""
+        p = self.patch
+        lvl = 0.25 + (midi_vel/127/2)
+        amp_env = synthio.Envelope(attack_time=p.amp_env.attack_time,
+                                   decay_time=p.amp_env.decay_time,
+                                   release_time=p.amp_env.release_time,
+                                   attack_level=lvl, sustain_level=lvl)
+        filt_env = synthio.LFO(once=True, rate=1 / (p.filt_env.attack_time + 0.001),
+                               offset=100, scale=p.filt_f, waveform=lfo_exp_wave)
+        filt = synthio.Biquad(synthio.FilterMode.LOW_PASS, frequency=filt_env, Q=p.filt_q)
+        f = synthio.midi_to_hz(midi_note)
+        osc1 = synthio.Note(frequency=f, waveform=self.waveform, envelope=amp_env, filter=filt)
+        osc2 = synthio.Note(frequency=f * p.detune, waveform=self.waveform,
+                            envelope=amp_env, filter=filt)
+        self.voices[midi_note] = (osc1, osc2, filt_env)
+        self.synth.press((osc1, osc2))
+        self.synth.blocks.append(filt_env)
+
+    def note_off(self, midi_note, midi_vel=0):  # pylint: disable=unused-argument
+        """Release a voice and let go of its objects"""
+        osc1, osc2, filt_env = self.voices.pop(midi_note, (None, None, None))
+        if osc1:
+            self.synth.release((osc1, osc2))
+            self.synth.blocks.remove(filt_env)
+
+    def update(self):
+        """Nothing to do per tick"""
+
+def play(inst, synth, events, held):
+    """Play an arpeggio of events note_ons, returns (events/s, synthio objects made)"""
+    made = sum(host_shims.synthio_made.values())
+    t = time.perf_counter()
+    for i in range(events):
+        inst.note_on(36 + (i * 7) % 48)
+        if i >= held:
+            inst.note_off(36 + ((i - held) * 7) % 48)
+        if i % 4 == 3:
+            synth.forget_released()  # releases that finished since last update
+            inst.update()
+    dt = time.perf_counter() - t
+    return events / dt, sum(host_shims.synthio_made.values()) - made
+
+def main(events=20000, held=6):
+    """Run the note_on/note_off benchmarks"""
+    patch = Patch('bench')
+    print("%-22s %12s %14s" % ("", "note_ons/s", "synthio made"))
+    synth = synthio.Synthesizer()
+    pooled = PolyWaveSynth(synth, patch)
+    rate, made = play(pooled, synth, events, held)
+    print("%-22s %12.0f %14d" % ("voice pool (%d voices)" % len(pooled.voice_pool), rate, made))
+    synth = synthio.Synthesizer()
+    allocating = AllocatingVoices(synth, patch, pooled.waveform)
+    rate, made = play(allocating, synth, events, held)
+    print("%-22s %12.0f %14d" % ("new objects per note", rate, made))
+    print(events, "note_ons,", held, "held at a time")
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:3]])
@@ -0,0 +1,97 @@
+# SPDX-FileCopyrightText: Copyright (c) 2024 Tod Kurt
+# SPDX-License-Identifier: MIT
+"""
+`bench_warm.py`
+================================================================================
+
+Host-side (desktop Python) benchmark of patch load latency with a cold
+`wave_cache` against one warmed by `PolyWaveSynth.warm_patches()`, the
+way code.py warms the patches the touch keys can reach while the button
+is held. Each of nine wavetable patches is loaded (`stage_patch()` and
+`swap_patch()`, as `load_patches_action()` does) and its first note
+played, after clearing the cache, and after clearing it and warming all
+nine with warm_patches' default RAM budget. Reports the time to load and
+play, and the waves read from the file meanwhile.
+
+On the host, the WAV files are in the OS's file cache, so a cold load is
+much cheaper than reading flash on a microcontroller; the waves read
+show what a warm cache saves there.
+
+Usage:
+    pip3 install numpy
+    python3 bench_warm.py [rounds]
+
+"""
+
+import contextlib
+import io
+import os
+import sys
+import time
+
+import host_shims
+import synthio
+from synth_tools.patch import Patch, WaveType
+from synth_tools.instrument import PolyWaveSynth
+from synth_tools.waves import wave_cache
+
+def reachable_patches():
+    """Nine wavetable patches, one per WAV file, like the touch keys reach"""
+    names = sorted(f[:-4] for f in os.listdir(host_shims.HOST_DIR + '/wavetables')
+                   if f.upper().endswith('.WAV'))[:9]
+    patches = []
+    for i, name in enumerate(names):
+        patch = Patch(name, wave_type=WaveType.WTB, wave=name)
+        patch.wave_mix = i / len(names)
+        patches.append(patch)
+    return patches
+
+def cold():
+    """Forget all cached waves and WAV frame counts"""
+    wave_cache.clear()
+    wave_cache.nframes.clear()
+
+def load(inst, patch):
+    """Load patch like code.py does and play its first note,
+    returns (ms, waves read from file)"""
+    misses = wave_cache.misses
+    with contextlib.redirect_stdout(io.StringIO()):  # loading chatter
+        t = time.perf_counter()
+        for staged in inst.stage_patch(patch):
+            pass
+        inst.swap_patch(staged)
+        route = inst.wave_pos_route  # synthio computes it by the next block
+        route.block.value = min(route.offset, inst.wavetable.num_waves - 1)
+        inst.note_on(60)  # mixes the waves at the patch's wave position
+        dt = time.perf_counter() - t
+        inst.note_off(60)
+    return dt * 1000, wave_cache.misses - misses
+
+def main(rounds=20):
+    """Run the cold vs warm load benchmarks"""
+    patches = reachable_patches()
+    inst = PolyWaveSynth(synthio.Synthesizer(), Patch('init'))
+    print("%-10s %9s %6s %9s %6s" % ("patch", "cold ms", "reads", "warm ms", "reads"))
+    total_cold = total_warm = warm_ms = 0
+    for patch in patches:
+        cold_ms = warm_load_ms = 0
+        for _ in range(rounds):
+            cold()
+            ms, cold_reads = load(inst, patch)
+            cold_ms += ms / rounds
+            cold()
+            t = time.perf_counter()
+            for _ in inst.warm_patches(patches):
+                pass
+            warm_ms += (time.perf_counter() - t) * 1000 / rounds / len(patches)
+            ms, warm_reads = load(inst, patch)
+            warm_load_ms += ms / rounds
+        total_cold += cold_ms / len(patches)
+        total_warm += warm_load_ms / len(patches)
+        print("%-10s %9.2f %6d %9.2f %6d" % (patch.name, cold_ms, cold_reads,
+                                             warm_load_ms, warm_reads))
+    print("%-10s %9.2f %6s %9.2f" % ("average", total_cold, "", total_warm))
+    print("warming all %d patches: %.2f ms" % (len(patches), warm_ms))
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:2]])
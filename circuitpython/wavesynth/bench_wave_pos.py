@@ -0,0 +1,80 @@
+# SPDX-FileCopyrightText: Copyright (c) 2024 Tod Kurt
+# SPDX-License-Identifier: MIT
+"""
+`bench_wave_pos.py`
+================================================================================
+
+Host-side (desktop Python) benchmark of `PolyWaveSynth.update()` on a
+wavetable patch with 4, 8 and 12 voices held, with all voices sharing one
+wave position (`WAVE_POS_SHARED`) and with each voice at its own
+(`WAVE_POS_VELOCITY`), remixing at most `wave_pos_budget` voices per
+update(), or all of them. Reports time per update(), peak traced bytes
+per update() and the per-voice waveform buffers' RAM.
+
+The wave position follows a slow LFO, set on the wave position route
+each tick the way synthio would compute it, so voices move every tick.
+
+Usage:
+    pip3 install numpy
+    python3 bench_wave_pos.py [ticks]
+
+"""
+
+import math
+import sys
+import time
+import tracemalloc
+
+import host_shims  # pylint: disable=unused-import
+import synthio
+from synth_tools.patch import Patch, WaveType
+from synth_tools.instrument import PolyWaveSynth
+
+VOICE_COUNTS = (4, 8, 12)
+WAVE = 'BRAIDS01'  # 64 waves of 256 samples
+
+def make_synth(num_voices, tracking, budget):
+    """A PolyWaveSynth with num_voices notes held at different velocities"""
+    patch = Patch('bench', wave_type=WaveType.WTB, wave=WAVE)
+    inst = PolyWaveSynth(synthio.Synthesizer(), patch, num_voices=num_voices,
+                         wave_pos_tracking=tracking, wave_pos_budget=budget)
+    for i in range(num_voices):
+        inst.note_on(48 + i, 40 + i * 7)
+    return inst
+
+def run(inst, ticks):
+    """Call update() ticks times with the wave position moving, returns us/tick"""
+    route = inst.wave_pos_route
+    top = inst.wavetable.num_waves - 1
+    t = time.perf_counter()
+    for i in range(ticks):
+        route.block.value = top / 2 * (1 + 0.8 * math.sin(i * 0.01))  # 0.16 Hz at 10 ms ticks
+        inst.update()
+    return (time.perf_counter() - t) / ticks * 1e6
+
+def bench(inst, ticks):
+    """Time ticks update()s, then trace their peak, returns (us/tick, peak bytes)"""
+    run(inst, 10)  # warm up, fills any scratch
+    us = run(inst, ticks)
+    tracemalloc.start()
+    run(inst, 200)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return us, peak
+
+def main(ticks=2000):
+    """Run the per-voice wave position benchmarks"""
+    print("%6s %-22s %10s %12s %14s" % ("voices", "wave positions", "us/update",
+                                        "peak bytes", "voice buf bytes"))
+    for n in VOICE_COUNTS:
+        for label, tracking, budget in (
+                ("shared", PolyWaveSynth.WAVE_POS_SHARED, 2),
+                ("per voice, budget 2", PolyWaveSynth.WAVE_POS_VELOCITY, 2),
+                ("per voice, budget all", PolyWaveSynth.WAVE_POS_VELOCITY, n)):
+            inst = make_synth(n, tracking, budget)
+            us, peak = bench(inst, ticks)
+            buf_bytes = sum(v.waveform.nbytes for v in inst.voice_pool if v.waveform is not None)
+            print("%6d %-22s %10.1f %12d %14d" % (n, label, us, peak, buf_bytes))
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:2]])
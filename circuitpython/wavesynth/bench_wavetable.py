@@ -0,0 +1,68 @@
+# SPDX-FileCopyrightText: Copyright (c) 2024 Tod Kurt
+# SPDX-License-Identifier: MIT
+"""
+`bench_wavetable.py`
+================================================================================
+
+Host-side (desktop Python) benchmark of `Wavetable.set_wave_pos()` on a
+256-sample, 64-wave table, with the in-place crossfade (`inplace_mix=True`)
+and with the `lerp()` that makes new arrays on every call.
+Reports time per call and the peak bytes of temporary arrays per call.
+
+The wave position follows a slow LFO, like `PolyWaveSynth.update()`
+calling set_wave_pos() every 10 ms while the wave LFO moves.
+
+Usage:
+    pip3 install numpy
+    python3 bench_wavetable.py [calls] [wavetable.WAV]
+
+"""
+
+import math
+import sys
+import time
+import tracemalloc
+
+import host_shims  # pylint: disable=unused-import
+from synth_tools.waves import Wavetable
+
+WAVE_FILE = '/wavetables/BRAIDS01.WAV'  # 64 waves of 256 samples
+
+def wave_positions(calls, num_waves):
+    """Wave positions of a 0.5 Hz LFO sampled every 10 ms, over most of the table"""
+    mid = (num_waves - 1) / 2
+    return [mid + mid * 0.9 * math.sin(2 * math.pi * 0.5 * i * 0.01) for i in range(calls)]
+
+def bench(wavetable, positions):
+    """Time set_wave_pos() over positions, returns (us/call, peak temp bytes/call)"""
+    wavetable.set_wave_pos(positions[0])  # warm up, fills any scratch
+    tracemalloc.start()
+    peak = 0
+    for pos in positions[:200]:  # temporaries are the same call to call
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        wavetable.set_wave_pos(pos)
+        peak = max(peak, tracemalloc.get_traced_memory()[1] - base)
+    tracemalloc.stop()
+    t = time.perf_counter()
+    for pos in positions:
+        wavetable.set_wave_pos(pos)
+    return (time.perf_counter() - t) / len(positions) * 1e6, peak
+
+def main(calls=5000, wave_file=WAVE_FILE):
+    """Run the set_wave_pos() benchmarks"""
+    print("%-9s %-9s %10s %18s" % ("in_memory", "mix", "us/call", "peak temp bytes"))
+    for in_memory in (True, False):
+        for inplace_mix in (False, True):
+            wavetable = Wavetable(wave_file, size=256, in_memory=in_memory,
+                                  inplace_mix=inplace_mix)
+            positions = wave_positions(calls, wavetable.num_waves)
+            us, peak = bench(wavetable, positions)
+            print("%-9s %-9s %10.1f %18d" % (in_memory, "in-place" if inplace_mix else "lerp",
+                                             us, peak))
+            wavetable.deinit()
+    print(int(wavetable.num_waves), "waves of", wavetable.size, "samples,",
+          calls, "calls")
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:2]], *sys.argv[2:3])
@@ -9,7 +9,7 @@ from synth_tools.patch import Patch
 from synth_tools.instrument import PolyWaveSynth
 from synth_tools.param import ParamRange, ParamChoice
 import synth_tools.winterbloom_smolmidi as smolmidi
-from synth_tools.patch_saver import load_patches, save_patches, copy
+from synth_tools.patch_saver import load_patches, load_patches_bin, PatchJournal, PatchBank, copy
 
 from synthui import SynthUI, splash_screen
 
@@ -31,8 +31,15 @@ time.sleep(1)  # let USB quiet down (when debugging)
 midi_usb_in = smolmidi.MidiIn(usb_midi.ports[0])
 midi_uart_in = smolmidi.MidiIn(hw.midi_uart)
 
-patches = load_patches()
-print("loaded ", len(patches), "patches")
+patch_journal = PatchJournal()
+patches = PatchBank(patch_journal)  # patches are only read when used
+journal_ok = True  # False if the journal is there but could not be read
+if not len(patches):  # no journal yet, start one from the older patch files
+    if patch_journal.error and patch_journal.exists():
+        print("could not read", patch_journal.fname, "- leaving it alone, saving is off")
+        journal_ok = False
+    patches = load_patches_bin() or load_patches()
+print("loaded ", len(patches or ()), "patches")
 if not patches:
     print("no patches, making up some")
     patch1 = Patch('one')
@@ -48,6 +55,8 @@ if not patches:
     patches = [patch1, Patch('two'), Patch('three'), Patch('four'),
                Patch('five'), Patch('six'), Patch('seven'),
                Patch('eight'), Patch('nine')]
+if journal_ok and not isinstance(patches, PatchBank):
+    patch_journal.save(patches)
 key_number_to_patch = (1, 0, 2, 0, 3, 4, 0, 5, 0, 6, 0, 7, 8, 0, 9, 0)
 
 patch = patches[0]
@@ -74,19 +83,38 @@ def get_wave_select_idx():
     #print("get_wave_select_idx:",idx)
     return idx
 
+def patch_names():
+    """Names of all patches, for picking one to morph to"""
+    if isinstance(patches, PatchBank):
+        return [name or "?" for name in patches.names]
+    return [p.name for p in patches]
+
+morph_to_idx = None  # patch the morph is going towards
+
+def morph_to_patch(patchidx):
+    """Morph towards patch #patchidx, only restarting the morph if it changed"""
+    global morph_to_idx
+    if patchidx == morph_to_idx and inst.morph:
+        return  # knob moved but stayed on the same choice
+    morph_to_idx = patchidx
+    if isinstance(patches, PatchBank):
+        inst.morph_to(patches.peek(patchidx))
+    else:
+        inst.morph_to(patches[patchidx])
+
 # set of parameter pairs adjustable by the user
 params = (
     # Pair 0
     ParamRange("FiltFreq", "filter frequency", 1234, "%4d", 60, 8000,
-               setter=lambda x: setattr(patch, "filt_f", x),
+               setter=lambda x: patch.set("filt_f", x),
                getter=lambda: getattr(patch, "filt_f")),
     ParamRange("FilterRes", "filter resonance", 0.7, "%1.2f", 0.1, 2.5,
-               setter=lambda x: setattr(patch, "filt_q", x),
+               setter=lambda x: patch.set("filt_q", x),
                getter=lambda: getattr(patch, "filt_q")),
     
     # Pair 1
     ParamRange("WaveMix", "wave mix", 0.2, "%.2f", 0.0, 0.99,
-               setter=lambda x: setattr(patch, "wave_mix", x),
+               setter=lambda x: patch.set("wave_mix", x),
                getter=lambda: getattr(patch, "wave_mix")),
     ParamChoice("WaveSel", "wave select", 0, wave_selects,
                 setter=lambda x: update_wave_select(x),
@@ -95,51 +123,57 @@ params = (
     
     # Pair 2
     ParamRange("WavLFO", "wave lfo amount", 0.3, "%2.1f", 0.0, 5,
-               setter=lambda x: setattr(patch, "wave_mix_lfo_amount", x),
+               setter=lambda x: patch.set("wave_mix_lfo_amount", x),
                getter=lambda: getattr(patch, "wave_mix_lfo_amount")),
     ParamRange("WavRate", "wave lfo rate", 0.3, "%2.1f", 0.0, 5,
-               setter=lambda x: setattr(patch, "wave_mix_lfo_rate", x),
+               setter=lambda x: patch.set("wave_mix_lfo_rate", x),
                getter=lambda: getattr(patch, "wave_mix_lfo_rate")
                ),
     
     # Pair 3
     ParamRange("AmpAtk", "attack time", 0.1, "%1.2f", 0.0, 3.0,
-               setter=lambda x: setattr(patch.amp_env,"attack_time", x),
+               setter=lambda x: patch.set("amp_env.attack_time", x),
                getter=lambda: getattr(patch.amp_env, "attack_time")
                ),
     ParamRange("AmpRls", "release time", 0.3, "%1.2f", 0.0, 3.0,
-               setter=lambda x: setattr(patch.amp_env,"release_time", x),
+               setter=lambda x: patch.set("amp_env.release_time", x),
                getter=lambda: getattr(patch.amp_env, "release_time")
                ),
     
     # Pair 4
     ParamRange("FiltAtk", "filter attack ", 1.1, "%1.2f", 0.01, 3.0,
-               setter=lambda x: setattr(patch.filt_env, "attack_time", x),
+               setter=lambda x: patch.set("filt_env.attack_time", x),
                getter=lambda: getattr(patch.filt_env, "attack_time")
                ),
     ParamRange("FiltRls", "filter release", 0.8, "%1.2f", 0.01, 3.0,
-               setter=lambda x: setattr(patch.filt_env, "release_time", x),
+               setter=lambda x: patch.set("filt_env.release_time", x),
                getter=lambda: getattr(patch.filt_env, "release_time")
                ),
 
     # Pair 5
     ParamRange("FiltEnv", "filter env amount", 0, "%.2f", -0.99, 0.99,
-               setter=lambda x: setattr(patch, "filt_env_amount", x),
+               setter=lambda x: patch.set("filt_env_amount", x),
                #getter=lambda: getattr(patch, "filt_env_amount")
                ),
     ParamChoice("FiltType", "filter type", 0, filter_types,
-                setter=lambda x: setattr(patch,"filt_type",filter_types[x]),
+                setter=lambda x: patch.set("filt_type", filter_types[x]),
                 #getter=lambda: getattr(patch, "filt_type")
                 ),
     
     # Pair 6
     ParamRange("Octave", "octave range", 0, "%d", -3, 2,
-               setter=lambda x: setattr(patch, "octave", int(x)),
+               setter=lambda x: patch.set("octave", int(x)),
                getter=lambda: getattr(patch, "octave")
                ),
     ParamRange("Volume", "volume", 0.7, "%1.2f", 0.1, 1.0,
                setter=lambda x: hw.set_volume(min(max(x,0),1))),
 
+    # Pair 7
+    ParamRange("Morph", "patch morph", 0, "%.2f", 0.0, 1.0,
+               setter=lambda x: inst.set_morph(x)),
+    ParamChoice("MorphTo", "morph to patch", 0, patch_names(),
+                setter=lambda x: morph_to_patch(x)),
+
 
 )
 
@@ -149,25 +183,52 @@ def update_params():
         #print("updating",p)
         p.update()
 
-def save_patches_action():
-    v = hw.get_volume()
-    hw.set_volume(0)
-    time.sleep(0.2)
-    synthui.set_patch_name("Saving...")
+def show_save_progress(done):
+    synthui.set_progress("saving", done)
     hw.display.refresh()
-    save_patches(patches)
+
+async def save_patches_action():
+    """Save changed patches a few at a time, so MIDI and sound keep going"""
+    if not journal_ok:  # saving would write over the journal we could not read
+        print("not saving,", patch_journal.fname, "could not be read")
+        return
+    if isinstance(patches, PatchBank):
+        saving = patches.save_async(progress=show_save_progress)
+    else:
+        saving = patch_journal.save_async(patches, progress=show_save_progress)
+    num_bytes, max_stall = await saving
     synthui.set_patch_name(patch.name)
-    hw.set_volume(v)
+    if num_bytes is None:
+        print("save failed, changed patches kept for the next save")
+    else:
+        print("saved", num_bytes, "bytes, max stall: %d ms" % (max_stall * 1000))
+
+def reachable_patches():
+    """The patches the touch keys can load, without disturbing the bank's cache"""
+    for patchidx in key_number_to_patch:
+        if 0 < patchidx <= len(patches):
+            if isinstance(patches, PatchBank):
+                yield patches.peek(patchidx-1)
+            else:
+                yield patches[patchidx-1]
 
-def load_patches_action(patchidx):
+async def load_patches_action(patchidx):
+    """Load a patch a piece per event loop tick, so UI and MIDI keep going"""
     global patch
     patch = patches[patchidx]
     update_params()
     synthui.set_patch_name(patch.name)
     synthui.refresh_gauge_cluster()
-    inst.note_off_all()
-    inst.load_patch( patch )
-    print("loaded patch #",patchidx)
+    max_stall = 0  # longest time the UI task went without yielding
+    t = t_start = time.monotonic_ns()
+    for staged in inst.stage_patch( patch ):
+        max_stall = max(max_stall, time.monotonic_ns() - t)
+        await asyncio.sleep(0)
+        t = time.monotonic_ns()
+    inst.swap_patch(staged)
+    max_stall = max(max_stall, time.monotonic_ns() - t)
+    print("loaded patch #",patchidx, "in %d ms, max stall: %d ms" % (
+        (time.monotonic_ns() - t_start) // 1_000_000, max_stall // 1_000_000))
 
 
 
@@ -211,6 +272,7 @@ async def ui_handler():
     notes_pressed = [None] * len(hw.touchins)
     button_held = False
     button_with_touch = False
+    warming = None  # warms up reachable patches while button is held
     p = 0  # which param pair we're looking at
     
     while True:
@@ -223,6 +285,7 @@ async def ui_handler():
         if button := hw.check_button():
             if button.pressed:
                 button_held = True
+                warming = inst.warm_patches(reachable_patches())
             if button.released:
                 # only advance UI if not doing patch loading gesture
                 if not button_with_touch:
@@ -231,6 +294,11 @@ async def ui_handler():
                     print("select param pair:", p)
                 button_held = False
                 button_with_touch = False
+                warming = None
+
+        if warming:  # one patch per tick, so the UI stays quick
+            if next(warming, None) is None:
+                warming = None
                 
         if touches := hw.check_touch():
             for touch in touches:
@@ -242,10 +310,10 @@ async def ui_handler():
                         print("key:", touch.key_number, "patch:", patchidx)
                         if touch.key_number == 15:  # make this be save key
                             # Save!
-                            save_patches_action()
+                            await save_patches_action()
                         elif patchidx > 0:
                             # Load!
-                            load_patches_action(patchidx-1)
+                            await load_patches_action(patchidx-1)
                             
                     else:  # trigger a note
                         button_with_touch = False
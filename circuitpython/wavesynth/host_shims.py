@@ -0,0 +1,231 @@
+# SPDX-FileCopyrightText: Copyright (c) 2024 Tod Kurt
+# SPDX-License-Identifier: MIT
+"""
+`host_shims.py`
+================================================================================
+
+Host-side (desktop Python) stand-ins for the CircuitPython modules
+`synth_tools` imports, so the `bench_*.py` scripts can run it on a desktop:
+
+* `ulab.numpy` is numpy (``pip3 install numpy``), with ulab's array truthiness
+* `adafruit_wave` is the standard `wave` module
+* `synthio` has just enough of its classes to build voices, it makes
+  no sound, and `synthio_made` counts the objects made of each class
+* `micropython.const` does nothing
+* paths under `/wavetables`, as on the CIRCUITPY drive, go to the
+  `wavetables` directory next to this file
+
+Host timings only compare one way of doing something against another,
+they say nothing about how fast either is on an RP2040.
+
+Usage: ``import host_shims`` before anything from `synth_tools`.
+
+"""
+
+import builtins
+import os
+import sys
+import types
+import wave
+
+import numpy
+
+HOST_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HOST_DIR, '..', 'lib'))
+
+class ndarray(numpy.ndarray):
+    """numpy array that is true when not empty, like a ulab array"""
+    def __bool__(self):
+        return len(self) > 0
+
+def _ulab_func(func):
+    def wrapped(*args, **kwargs):
+        result = func(*args, **kwargs)
+        if isinstance(result, numpy.ndarray):
+            return result.view(ndarray) if result.ndim else result.item()
+        return result
+    return wrapped
+
+ulab_numpy = types.ModuleType('ulab.numpy')
+for _name in dir(numpy):
+    _obj = getattr(numpy, _name)
+    setattr(ulab_numpy, _name, _ulab_func(_obj) if callable(_obj) and
+            not isinstance(_obj, type) else _obj)
+ulab_numpy.float = numpy.float64  # ulab's default float type
+ulab_numpy.ndarray = ndarray
+
+ulab = types.ModuleType('ulab')
+ulab.numpy = ulab_numpy
+sys.modules['ulab'] = ulab
+sys.modules['ulab.numpy'] = ulab_numpy
+
+adafruit_wave = types.ModuleType('adafruit_wave')
+adafruit_wave.open = wave.open
+sys.modules['adafruit_wave'] = adafruit_wave
+
+def circuitpy_path(path):
+    """Host path of a path on the CIRCUITPY drive, only /wavetables is mapped"""
+    if isinstance(path, str) and path.startswith('/wavetables'):
+        return HOST_DIR + path
+    return path
+
+def _redirect(func):
+    def redirected(path, *args, **kwargs):
+        return func(circuitpy_path(path), *args, **kwargs)
+    return redirected
+
+builtins.open = _redirect(builtins.open)
+os.listdir = _redirect(os.listdir)
+os.stat = _redirect(os.stat)
+
+micropython = types.ModuleType('micropython')
+micropython.const = lambda x: x
+sys.modules['micropython'] = micropython
+
+
+synthio_made = {}  # fake synthio class name -> how many were made
+
+def _count(obj):
+    name = type(obj).__name__
+    synthio_made[name] = synthio_made.get(name, 0) + 1
+
+
+class _Block:
+    """Base of the fake synthio blocks, keeps whatever it is given"""
+    def __init__(self, *args, **kwargs):
+        _count(self)
+        self.args = args
+        self.__dict__.update(kwargs)
+        self.value = 0
+
+    def retrigger(self):
+        """Restart the block"""
+
+
+class LFO(_Block):
+    """Fake synthio.LFO"""
+    def __init__(self, waveform=None, *, rate=1.0, scale=1.0, offset=0.0,
+                 phase_offset=0.0, once=False, interpolate=True):
+        super().__init__(waveform=waveform, rate=rate, scale=scale, offset=offset,
+                         phase_offset=phase_offset, once=once, interpolate=interpolate)
+
+
+class Math(_Block):
+    """Fake synthio.Math"""
+    def __init__(self, operation, a, b=0.0, c=1.0):
+        super().__init__(operation=operation, a=a, b=b, c=c)
+
+
+class MathOperation:
+    """Fake synthio.MathOperation"""
+    SUM, ADD_SUB, PRODUCT, MUL_DIV, SCALE_OFFSET, OFFSET_SCALE, LERP, \
+        CONSTRAINED_LERP, DIV_ADD, ADD_DIV, MID, MAX, MIN, ABS = range(14)
+
+
+class FilterMode:
+    """Fake synthio.FilterMode"""
+    LOW_PASS, HIGH_PASS, BAND_PASS, NOTCH = range(4)
+
+
+class Biquad:
+    """Fake synthio.Biquad, its mode is read-only like the real one"""
+    def __init__(self, mode, frequency=0, Q=0.7071):
+        _count(self)
+        self._mode = mode
+        self.frequency = frequency
+        self.Q = Q
+
+    @property
+    def mode(self):
+        """The filter mode, fixed when the Biquad is made"""
+        return self._mode
+
+
+class Envelope:
+    """Fake synthio.Envelope"""
+    def __init__(self, *, attack_time=0.1, decay_time=0.05, release_time=0.2,
+                 attack_level=1.0, sustain_level=0.8):
+        _count(self)
+        self.attack_time = attack_time
+        self.decay_time = decay_time
+        self.release_time = release_time
+        self.attack_level = attack_level
+        self.sustain_level = sustain_level
+
+
+class Note:
+    """Fake synthio.Note"""
+    def __init__(self, frequency, *, panning=0, waveform=None, envelope=None,
+                 amplitude=1.0, bend=0.0, filter=None, ring_frequency=0,  # pylint: disable=redefined-builtin
+                 ring_bend=0, ring_waveform=None):
+        _count(self)
+        self.frequency = frequency
+        self.panning = panning
+        self.waveform = waveform
+        self.envelope = envelope
+        self.amplitude = amplitude
+        self.bend = bend
+        self.filter = filter
+        self.ring_frequency = ring_frequency
+        self.ring_bend = ring_bend
+        self.ring_waveform = ring_waveform
+
+
+class EnvelopeState:
+    """Fake synthio.EnvelopeState"""
+    ATTACK, DECAY, SUSTAIN, RELEASE = range(4)
+
+
+class Synthesizer:
+    """Fake synthio.Synthesizer, notes go from pressed to released to gone"""
+    def __init__(self, *, sample_rate=28000, channel_count=1, waveform=None, envelope=None):
+        self.sample_rate = sample_rate
+        self.channel_count = channel_count
+        self.waveform = waveform
+        self.envelope = envelope
+        self.blocks = []
+        self.pressed = []
+        self._released = []
+
+    def press(self, notes=()):
+        """Start notes"""
+        for n in notes if isinstance(notes, (list, tuple)) else (notes,):
+            if n in self._released:
+                self._released.remove(n)
+            if n not in self.pressed:
+                self.pressed.append(n)
+
+    def release(self, notes=()):
+        """Release notes, they stay in note_info() until forget_released()"""
+        for n in notes if isinstance(notes, (list, tuple)) else (notes,):
+            if n in self.pressed:
+                self.pressed.remove(n)
+                self._released.append(n)
+
+    def release_all(self):
+        """Release all notes"""
+        self.release(tuple(self.pressed))
+
+    def forget_released(self):
+        """Let released notes finish, like their release times ran out"""
+        self._released.clear()
+
+    def note_info(self, note):
+        """(EnvelopeState, level) of a note, or (None, 0) if it is not playing"""
+        if note in self.pressed:
+            return EnvelopeState.SUSTAIN, 0.8
+        if note in self._released:
+            return EnvelopeState.RELEASE, 0.1
+        return None, 0.0
+
+
+def midi_to_hz(midi_note):
+    """Frequency of a MIDI note number"""
+    return 440 * 2 ** ((midi_note - 69) / 12)
+
+
+synthio = types.ModuleType('synthio')
+for _obj in (LFO, Math, MathOperation, FilterMode, Biquad, Envelope, Note,
+             EnvelopeState, Synthesizer, midi_to_hz):
+    setattr(synthio, _obj.__name__, _obj)
+sys.modules['synthio'] = synthio
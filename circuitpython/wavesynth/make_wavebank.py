@@ -0,0 +1,127 @@
+# SPDX-FileCopyrightText: Copyright (c) 2024 Tod Kurt
+# SPDX-License-Identifier: MIT
+"""
+`make_wavebank.py`
+================================================================================
+
+Host-side (desktop Python) tool to pack a directory of wavetable WAVs
+into a single wave bank file for `synth_tools.waves.WaveBank`.
+
+Usage:
+    python3 make_wavebank.py wavetables wavetables/wavebank.bin [codec] [min_snr]
+
+Then copy the bank file into CIRCUITPY/wavetables alongside the WAVs.
+WAVs must be mono 16-bit, like the ones from https://waveeditonline.com/
+
+The optional codec is one of "pcm16" (default), "ulaw8" (half the size),
+"block4" or "adpcm4" (both about a quarter the size), or "auto", which
+gives each wavetable the smallest codec that keeps its signal to noise
+ratio at min_snr dB (default 24) or better. For the compressed codecs,
+the reconstruction error of each wavetable against its WAV is printed.
+
+"""
+
+import array
+import math
+import os
+import struct
+import sys
+import wave
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lib'))
+from synth_tools import wavecodec  # pylint: disable=wrong-import-position
+
+MAGIC = b'WTBK'
+VERSION = 3
+NAME_LEN = 16
+WAVE_SIZE = 256
+MIN_SNR = 24  # dB, for the "auto" codec
+
+def encode_table(name, data, codec, wave_size, verbose=True):
+    """Encode a table's int16 sample bytes wave by wave,
+    returns the encoded bytes and their SNR in dB"""
+    samples = array.array('h', data)
+    if sys.byteorder == 'big':
+        samples.byteswap()
+    out = bytearray()
+    err_sum, sig_sum, err_max = 0, 0, 0
+    for i in range(0, len(samples) - wave_size + 1, wave_size):
+        wav = list(samples[i:i+wave_size])
+        enc = wavecodec.encode_wave(wav, codec)
+        dec = wavecodec.decode_wave(enc, codec, wave_size)
+        for a, b in zip(wav, dec):
+            err_sum += (a - b) ** 2
+            sig_sum += a * a
+            err_max = max(err_max, abs(a - b))
+        out += enc
+    snr = 10 * math.log10(sig_sum / err_sum) if err_sum else float('inf')
+    if verbose and codec != wavecodec.CODEC_PCM16:
+        print("%-10s %-6s %6d -> %6d bytes, SNR %5.1f dB, max error %5d" %
+              (name, wavecodec.codec_names[codec], len(data), len(out), snr, err_max))
+    return out, snr
+
+def encode_table_auto(name, data, wave_size, min_snr):
+    """Encode a table with the smallest codec that keeps its SNR at min_snr or
+    better: block4, else ulaw8, else pcm16. Returns the codec and encoded bytes"""
+    for codec in (wavecodec.CODEC_BLOCK4, wavecodec.CODEC_ULAW8):
+        enc, snr = encode_table(name, data, codec, wave_size, verbose=False)
+        if snr >= min_snr:
+            break
+    else:
+        codec = wavecodec.CODEC_PCM16
+        enc, snr = encode_table(name, data, codec, wave_size, verbose=False)
+    print("%-10s %-6s %6d -> %6d bytes, SNR %5.1f dB" %
+          (name, wavecodec.codec_names[codec], len(data), len(enc), snr))
+    return codec, enc
+
+def make_wavebank(wave_dir, bank_path, codec_name='pcm16', wave_size=WAVE_SIZE,
+                  min_snr=MIN_SNR):
+    """
+    Pack all the WAVs in wave_dir into bank_path. With codec_name "auto",
+    each table gets the smallest codec that keeps it at min_snr dB or better.
+    """
+    auto = codec_name == 'auto'
+    codec = wavecodec.CODEC_PCM16 if auto else wavecodec.codec_names.index(codec_name)
+    names, codecs, datas = [], [], []
+    for fname in sorted(os.listdir(wave_dir)):
+        name = fname.upper()
+        if not name.endswith('.WAV') or name.startswith('.'):
+            continue
+        with wave.open(os.path.join(wave_dir, fname), 'rb') as w:
+            if w.getsampwidth() != 2 or w.getnchannels() != 1:
+                print("skipping", fname, "unsupported format")
+                continue
+            data = w.readframes(w.getnframes())
+        name = name.replace('.WAV', '')
+        names.append(name)
+        if auto:
+            table_codec, enc = encode_table_auto(name, data, wave_size, min_snr)
+        else:
+            table_codec, enc = codec, encode_table(name, data, codec, wave_size)[0]
+        codecs.append(table_codec)
+        datas.append(enc)
+
+    entry_fmt = '<%dsIIBxxx' % NAME_LEN
+    index_len = 12 + len(names) * struct.calcsize(entry_fmt)
+    pcm_bytes = 0
+    with open(bank_path, 'wb') as fp:
+        fp.write(struct.pack('<4sBBHBxxx', MAGIC, VERSION, len(names), wave_size, codec))
+        offset = index_len
+        for name, table_codec, data in zip(names, codecs, datas):
+            nframes = len(data) // wavecodec.wave_bytes(table_codec, wave_size) * wave_size
+            fp.write(struct.pack(entry_fmt, name.encode()[:NAME_LEN],
+                                 nframes, offset, table_codec))
+            offset += len(data)
+            pcm_bytes += nframes * 2
+        for data in datas:
+            fp.write(data)
+    print("wrote", bank_path, ":", len(names), "wavetables,", offset, "bytes,",
+          "%.2fx smaller than pcm16" % (pcm_bytes / max(offset - index_len, 1)))
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (3, 4, 5):
+        print("usage: make_wavebank.py <wave_dir> <bank_file> [codec] [min_snr]")
+        sys.exit(1)
+    codec_name = sys.argv[3] if len(sys.argv) > 3 else 'pcm16'
+    min_snr = float(sys.argv[4]) if len(sys.argv) > 4 else MIN_SNR
+    make_wavebank(sys.argv[1], sys.argv[2], codec_name, min_snr=min_snr)
@@ -27,7 +27,8 @@ class SynthUI(displayio.Group):
         self.params = params
         self.num_params = len(params)
         
-        self.cluster = GaugeCluster(self.num_params, x=1, y=13, width=6, height=20, xstride=2.3)
+        xstride = 2.3 if self.num_params <= 14 else 2.0  # fit up to 8 pairs in 128 px
+        self.cluster = GaugeCluster(self.num_params, x=1, y=13, width=6, height=20, xstride=xstride)
         self.append(self.cluster.gauges)
         self.append(self.cluster.select_lines)  # indicates which param set is editable
         
@@ -59,6 +60,10 @@ class SynthUI(displayio.Group):
     def set_patch_name(self,pname):
         self.labelP.text="patch:"+pname        
 
+    def set_progress(self, what, done):
+        """Show how much (0-1) of a long task like saving is done"""
+        self.labelP.text = "%s %d%%" % (what, int(done * 100))
+
     def _fix_textB_right_justified(self):
         self.textB.scale=2
         w = self.textB.width * 2  # scale=2 above